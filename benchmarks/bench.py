@@ -0,0 +1,281 @@
+""" Benchmarks for discovery, status and recording of migrations.
+
+Generate synthetic migrations trees and histories in temporary
+directory and measure main commands:
+
+    python benchmarks/bench.py --files 100 1000 --history 1000 100000 \\
+        --output bench.json
+
+    python benchmarks/bench.py --compare old.json new.json
+
+The Mongo backend is measured with mongomock if it is installed.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migranite  # noqa
+from migranite import migrations  # noqa
+from migranite import run  # noqa
+from migranite.db import get as get_db  # noqa
+from migranite.db.base import MigrationResult  # noqa
+
+MIGRATION = '''\
+""" Synthetic migration {num}
+
+Long description of synthetic migration {num}.
+"""
+
+
+def run():
+    pass
+'''
+
+RECORD_SIZE = 10
+BACKENDS = ['json', 'json-journal', 'sqlite', 'mongo']
+
+
+class Case:
+    """ Benchmark case in its own temporary directory.
+    """
+    def __init__(self, backend, files, history):
+        self.backend = backend
+        self.files = files
+        self.history = history
+        self.path = tempfile.mkdtemp(prefix='migranite-bench-')
+
+        self.settings = {
+            'file': os.path.join(self.path, '.migranite'),
+            'migrations': {'path': os.path.join(self.path, 'migrations'),
+                           'digits': 6},
+            'templates': {'path': self.path, 'default': 'default.py'},
+            'database': {'backend': backend.split('-')[0]},
+        }
+
+        if backend.startswith('json'):
+            self.settings['database']['path'] = os.path.join(self.path, 'db.json')
+            self.settings['database']['journal'] = backend == 'json-journal'
+        elif backend == 'sqlite':
+            self.settings['database']['path'] = os.path.join(self.path, 'db.sqlite')
+        elif backend == 'mongo':
+            self.settings['database']['name'] = 'bench'
+
+        self.template = os.path.join(self.path, 'default.py')
+        with open(self.template, 'w') as f:
+            f.write(MIGRATION.format(num='new'))
+
+        self._generate_migrations()
+        self._generate_history()
+
+    def close(self):
+        shutil.rmtree(self.path)
+
+    def _generate_migrations(self):
+        os.makedirs(self.settings['migrations']['path'])
+
+        for num in range(1, self.files + 1):
+            path = os.path.join(self.settings['migrations']['path'],
+                                '{:06}-synthetic.py'.format(num))
+            with open(path, 'w') as f:
+                f.write(MIGRATION.format(num=num))
+
+    def _generate_history(self):
+        """ History of `history` results, every file is applied.
+        """
+        objects = migrations.get_all(dict(self.settings, migrations=dict(
+            self.settings['migrations'], cache=False)))
+        db = get_db(self.settings)
+
+        results = []
+        ts = datetime(2000, 1, 1)
+
+        for n in range(self.history):
+            migration = objects[n % len(objects)]
+            ts += timedelta(seconds=1)
+            results.append(MigrationResult(
+                ts=ts,
+                num=migration.num,
+                name=migration.name,
+                short=migration.short,
+                long=migration.long,
+                source=migration.source,
+                md5=migration.md5,
+                result=True,
+            ))
+
+        if self.backend.startswith('json'):
+            for r in results:
+                db.results.append(r)
+            db._save_results()
+        elif self.backend == 'sqlite':
+            with db.connection:
+                db.connection.executemany(
+                    "INSERT INTO results (ts, num, name, short, long, source, "
+                    "md5, result) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((r.ts.isoformat(sep='T'),) + tuple(r[1:8]) for r in results))
+        else:
+            docs = [r._asdict() for r in results]
+            for n in range(0, len(docs), 10000):
+                db.collection.insert_many(docs[n:n + 10000])
+
+
+def measure(func, memory=True, warmup=False):
+    """ Return (seconds, peak memory in bytes or None).
+    """
+    gc.collect()
+
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            if warmup:
+                func()
+
+            start = time.perf_counter()
+            func()
+            seconds = time.perf_counter() - start
+
+            peak = None
+            if memory:
+                tracemalloc.start()
+                func()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+    return seconds, peak
+
+
+def bench_case(case, memory=True):
+    settings = case.settings
+    no_cache = dict(settings, migrations=dict(settings['migrations'], cache=False))
+
+    def add_results():
+        db = get_db(settings)
+        db.results
+        for migration in migrations.get_all(settings)[:RECORD_SIZE]:
+            db.add(migration, True)
+
+    def discovery(settings):
+        for migration in migrations.get_all(settings):
+            migration.short, migration.md5
+
+    funcs = [
+        ('discovery', lambda: discovery(no_cache), case.files, False),
+        ('discovery-cached', lambda: discovery(settings), case.files, True),
+        ('list', lambda: run.print_list(settings), case.files, True),
+        ('list-all', lambda: run.print_list(settings, all=True), case.history, True),
+        ('run-nothing', lambda: run.migrate_all(settings), case.files, True),
+        ('add', add_results, RECORD_SIZE, False),
+        ('create', lambda: run.create(settings, case.template, 'new'), 1, False),
+    ]
+
+    for name, func, count, warmup in funcs:
+        seconds, peak = measure(func, memory, warmup)
+        yield {
+            'case': name,
+            'backend': case.backend,
+            'files': case.files,
+            'history': case.history,
+            'seconds': seconds,
+            'per_second': count / seconds if seconds else None,
+            'peak_memory': peak,
+        }
+
+
+def use_mongomock():
+    try:
+        import mongomock
+        import migranite.db.mongo
+    except ImportError:
+        return False
+
+    client = mongomock.MongoClient()
+    migranite.db.mongo.get_client = lambda *args, **kwargs: client
+    migranite.db.mongo.PYMONGO = True
+    return True
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def key(r):
+        return r['case'], r['backend'], r['files'], r['history']
+
+    old_results = {key(r): r for r in old['results']}
+
+    print("{:<18} {:<12} {:>7} {:>8} {:>10} {:>10} {:>8}".format(
+        'case', 'db', 'files', 'history', 'old, s', 'new, s', 'ratio'))
+
+    for r in new['results']:
+        o = old_results.get(key(r))
+        if o is None:
+            continue
+
+        print("{:<18} {:<12} {:>7} {:>8} {:>10.4f} {:>10.4f} {:>7.2f}x".format(
+            r['case'], r['backend'], r['files'], r['history'],
+            o['seconds'], r['seconds'], r['seconds'] / o['seconds']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--history', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--backends', nargs='+', default=BACKENDS,
+                        choices=BACKENDS)
+    parser.add_argument('--no-memory', action='store_true',
+                        help="don't measure peak memory")
+    parser.add_argument('--output', help="save results to JSON file")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if 'mongo' in args.backends and not use_mongomock():
+        print("mongomock is not installed, skip mongo", file=sys.stderr)
+        args.backends.remove('mongo')
+
+    report = {
+        'version': migranite.__version__,
+        'python': platform.python_version(),
+        'date': datetime.now().isoformat(),
+        'results': [],
+    }
+
+    print("{:<18} {:<12} {:>7} {:>8} {:>10} {:>12} {:>10}".format(
+        'case', 'db', 'files', 'history', 'seconds', 'per second', 'memory'))
+
+    for backend in args.backends:
+        for files in args.files:
+            for history in args.history:
+                case = Case(backend, files, history)
+                try:
+                    for r in bench_case(case, not args.no_memory):
+                        report['results'].append(r)
+                        print("{case:<18} {backend:<12} {files:>7} {history:>8} "
+                              "{seconds:>10.4f} {per_second:>12.1f} {memory:>10}"
+                              "".format(memory=r['peak_memory'] or '', **r))
+                finally:
+                    case.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+""" Cold start budget of the command line tool.
+
+Run `migranite version`, `help` and `list` in fresh interpreters and
+compare median overhead over bare interpreter start with the budget:
+
+    python benchmarks/coldstart.py --files 1000
+
+Exit with code 1 if any command is over its budget.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# milliseconds over `python -c pass`
+BUDGETS = {
+    'version': 50,
+    'help': 50,
+    'list': 150,
+}
+
+SETTINGS = """\
+[migrations]
+path = "migrations"
+
+[templates]
+path = "templates"
+
+[database]
+backend = "json"
+path = "db.json"
+journal = true
+"""
+
+MIGRATION = '''\
+""" Synthetic migration {num}
+"""
+
+
+def run():
+    pass
+'''
+
+
+def make_project(files):
+    path = tempfile.mkdtemp(prefix='migranite-coldstart-')
+    os.makedirs(os.path.join(path, 'migrations'))
+    os.makedirs(os.path.join(path, 'templates'))
+
+    with open(os.path.join(path, '.migranite'), 'w') as f:
+        f.write(SETTINGS)
+
+    for num in range(1, files + 1):
+        file_name = '{:06}-synthetic.py'.format(num)
+        with open(os.path.join(path, 'migrations', file_name), 'w') as f:
+            f.write(MIGRATION.format(num=num))
+
+    return path
+
+
+def timeit(args, cwd, repeat):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=11)
+    args = parser.parse_args()
+
+    path = make_project(args.files)
+
+    try:
+        base = timeit([sys.executable, '-c', 'pass'], path, args.repeat)
+        print("interpreter: {:.1f} ms".format(base))
+
+        # fill metadata cache, as after the first run on deploy
+        timeit([sys.executable, '-m', 'migranite', 'list'], path, 1)
+
+        failed = False
+
+        for command, budget in BUDGETS.items():
+            ms = timeit([sys.executable, '-m', 'migranite', command],
+                        path, args.repeat) - base
+            ok = ms <= budget
+            failed = failed or not ok
+            print("{:<8} {:>7.1f} ms  budget {:>4} ms  {}".format(
+                command, ms, budget, 'ok' if ok else 'OVER'))
+    finally:
+        shutil.rmtree(path)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
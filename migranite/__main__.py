@@ -2,16 +2,21 @@ import argparse
 import os
 import sys
 
-import zini
-
 from migranite import __version__
-import migranite.run
+from migranite.exceptions import MigraniteError
 import migranite.utils
 
+# Commands import migranite.run and other heavy modules only when called,
+# so `version` and `help` start fast.
+
 
 def _require_settings(func):
     def wrapper(parser, args):
+        args.settings = _parse_settings(args.settings)
+
         if 'migrations' in args.settings:
+            from migranite.log import to_stderr
+            to_stderr()
             func(parser, args)
         else:
             print("Settings file {!r} not found".format(args.settings['file']),
@@ -22,6 +27,9 @@ def _require_settings(func):
 
 
 def run_init(parser, args):
+    import migranite.run
+
+    args.settings = _parse_settings(args.settings)
     settings_path = args.settings['file']
 
     if os.path.exists(settings_path):
@@ -34,12 +42,18 @@ def run_init(parser, args):
 
 @_require_settings
 def run_list(parser, args):
+    import migranite.run
+
     migranite.run.print_list(args.settings, args.long, args.all)
 
 
 @_require_settings
 def run_create(parser, args):
-    if not args.template:
+    import migranite.run
+
+    template = args.template
+
+    if not template:
         if 'default' not in args.settings['templates']:
             print("Default template not set.", file=sys.stderr)
             sys.exit(1)
@@ -57,63 +71,74 @@ def run_create(parser, args):
 
 @_require_settings
 def run(parser, args):
+    import migranite.run
+
+    if args.profile and args.jobs > 1:
+        print("--profile can't be used with --jobs", file=sys.stderr)
+        sys.exit(1)
+
     if args.migrations:
         migranite.run.migrate(
-            args.settings, args.migrations, args.force)
+            args.settings, args.migrations, args.force,
+            args.jobs, args.async_limit, args.profile, args.target_jobs)
     else:
-        migranite.run.migrate_all(args.settings)
+        migranite.run.migrate_all(
+            args.settings, args.jobs, args.async_limit, args.profile,
+            args.target_jobs)
 
 
-def run_help(parser, args):
-    parser.print_help()
+@_require_settings
+def run_plan(parser, args):
+    import migranite.run
 
+    migranite.run.print_plan(args.settings, args.migrations, args.force, args.json)
 
-def run_version(parser, args):
-    print(__version__)
 
+@_require_settings
+def run_verify(parser, args):
+    import migranite.run
 
-def _parse_settings(path):
-    path = migranite.utils.parse_path(path)
+    migranite.run.verify(args.settings, args.jobs, args.json)
 
-    try:
-        with open(path, 'r', encoding='utf8') as f:
-            raw = f.read()
-    except FileNotFoundError:
-        return {'file': path}
 
-    settings_reader = zini.Zini()
+@_require_settings
+def run_stats(parser, args):
+    import migranite.run
+
+    migranite.run.print_stats(args.settings, args.limit)
 
-    settings_reader['migrations']['path'] = str
-    settings_reader['migrations']['digits'] = 3
 
-    settings_reader['templates']['path'] = str
-    settings_reader['templates']['default'] = "default.py"
+@_require_settings
+def run_compact(parser, args):
+    import migranite.run
 
-    settings_reader['database']['backend'] = str
+    migranite.run.compact(args.settings)
 
-    settings = settings_reader.parse(raw)
 
-    err = False
+def run_help(parser, args):
+    parser.print_help()
 
-    for section, key in [('migrations', 'path'),
-                         ('templates', 'path'),
-                         ('database', 'backend')]:
-        if key not in settings[section]:
-            print(("Section {!r} must include the {!r} key."
-                   "".format(section, key)), file=sys.stderr)
-            err = True
 
-    if err:
-        sys.exit(1)
+def run_version(parser, args):
+    print(__version__)
 
-    return settings
+
+def _parse_settings(path):
+    import migranite.settings
+
+    try:
+        return migranite.settings.load(path)
+    except FileNotFoundError:
+        return {'file': migranite.utils.parse_path(path)}
+    except MigraniteError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
 
 
 def main():
     parser = argparse.ArgumentParser(add_help=False)
 
     parser.add_argument('--settings',
-                        type=_parse_settings,
                         default='.migranite',
                         help="settings file (default '.migranite')")
 
@@ -177,6 +202,80 @@ def main():
                             action='store_true',
                             help="force run specified migrations")
 
+    parser_run.add_argument('-j', '--jobs',
+                            type=int,
+                            default=1,
+                            metavar='N',
+                            help="run up to N independent migrations in parallel")
+
+    parser_run.add_argument('--async-limit',
+                            type=int,
+                            default=None,
+                            metavar='N',
+                            help="run up to N async migrations at once")
+
+    parser_run.add_argument('--target-jobs',
+                            type=int,
+                            default=None,
+                            metavar='N',
+                            help="migrate up to N targets in parallel")
+
+    parser_run.add_argument('--profile',
+                            nargs='?',
+                            const='cprofile',
+                            default=None,
+                            choices=['cprofile', 'tracemalloc'],
+                            help="profile every migration (default cprofile)")
+
+    # plan
+
+    parser_plan = subparsers.add_parser('plan', help="show migrations which run would start")
+    parser_plan.set_defaults(func=run_plan)
+
+    parser_plan.add_argument('migrations',
+                             nargs='*',
+                             help="migrations for run")
+
+    parser_plan.add_argument('-f', '--force',
+                             action='store_true',
+                             help="force run specified migrations")
+
+    parser_plan.add_argument('--json',
+                             action='store_true',
+                             help="print plan as JSON")
+
+    # verify
+
+    parser_verify = subparsers.add_parser(
+        'verify', help="check that applied migrations were not changed")
+    parser_verify.set_defaults(func=run_verify)
+
+    parser_verify.add_argument('-j', '--jobs',
+                               type=int,
+                               default=None,
+                               metavar='N',
+                               help="hash files in N threads (default CPU count)")
+
+    parser_verify.add_argument('--json',
+                               action='store_true',
+                               help="print report as JSON")
+
+    # stats
+
+    parser_stats = subparsers.add_parser('stats', help="show the slowest migrations")
+    parser_stats.set_defaults(func=run_stats)
+
+    parser_stats.add_argument('-n', '--limit',
+                              type=int,
+                              default=10,
+                              metavar='N',
+                              help="number of migrations to show (default 10)")
+
+    # compact
+
+    parser_compact = subparsers.add_parser('compact', help="compact migrations database")
+    parser_compact.set_defaults(func=run_compact)
+
     # help
 
     parser_help = subparsers.add_parser('help', help="show this help message and exit")
@@ -190,7 +289,12 @@ def main():
     # --
 
     args = parser.parse_args()
-    getattr(args, 'func', run_help)(parser, args)
+
+    try:
+        getattr(args, 'func', run_help)(parser, args)
+    except MigraniteError as exc:
+        print(exc, file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,82 @@
+""" Shared event loop for asynchronous migrations.
+
+The loop runs in a background thread, so migrations started
+from different threads share it and overlap their I/O.
+asyncio is imported only when the first async migration runs.
+"""
+import threading
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+_semaphore = None
+_limit = None
+
+
+def set_limit(limit):
+    """ Set maximum number of migrations running on the loop at once.
+
+    :limit: positive integer or None for no limit
+    """
+    global _limit
+    _limit = limit
+
+
+def get_loop():
+    """ Return shared event loop, start it if needed.
+    """
+    global _loop, _thread
+    import asyncio
+
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever,
+                                       name='migranite-aio', daemon=True)
+            _thread.start()
+
+    return _loop
+
+
+def run(coro):
+    """ Run coroutine on shared loop and wait for result.
+    """
+    import asyncio
+
+    future = asyncio.run_coroutine_threadsafe(_limited(coro), get_loop())
+    return future.result()
+
+
+def close():
+    """ Stop shared loop if it is running.
+    """
+    global _loop, _thread, _semaphore
+
+    with _lock:
+        if _loop is None:
+            return
+
+        import asyncio
+
+        loop, thread = _loop, _thread
+        _loop = _thread = _semaphore = None
+
+    future = asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop)
+    future.result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+async def _limited(coro):
+    global _semaphore
+    import asyncio
+
+    if _limit is None:
+        return await coro
+
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(_limit)
+
+    async with _semaphore:
+        return await coro
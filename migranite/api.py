@@ -0,0 +1,588 @@
+""" Library API.
+
+    from migranite.api import Migranite
+
+    m = Migranite('.migranite')
+
+    if m.plan().needed:
+        m.run()
+
+Methods return result objects and raise migranite.exceptions.MigraniteError
+subclasses. Nothing is printed unless `output` file is given; waiting for
+locks and other warnings are logged to `migranite` logger.
+"""
+import contextlib
+import functools
+import threading
+import traceback
+from collections import namedtuple
+
+from colorama import Fore, Style
+
+from . import aio
+from . import migrations
+from .context import Context
+from .db import get as get_db
+from .exceptions import (
+    DependencyError,
+    LockLost,
+    MigraniteError,
+    MigrationFailed,
+    MigrationNotFound,
+)
+from .metrics import Measure
+from .targets import get_targets, target_settings
+
+MigrationRun = namedtuple('MigrationRun', ('migration', 'result', 'error'))
+MigrationRun.__doc__ = """ Run of one migration.
+
+:migration: migration object
+:result: True, False or None if skipped because of failed dependency
+:error: exception raised by migration or None
+"""
+
+Status = namedtuple('Status', ('migration', 'state', 'last'))
+Status.__doc__ = """ Status of migration.
+
+:migration: migration object
+:state: 'pending', 'success' or 'failed'
+:last: last result (MigrationResult) or None
+"""
+
+
+class Migranite:
+    """ Migrations of project.
+
+    :settings: settings dict or path to settings file
+    :output: file for progress and errors, like command line prints
+        (default None, print nothing)
+
+    Migrations are discovered once and their modules are kept loaded,
+    call `reload` to discover them again.
+    """
+    def __init__(self, settings, output=None):
+        if isinstance(settings, str):
+            from .settings import load
+            settings = load(settings)
+
+        self.settings = settings
+        self.output = output
+        self._objects = None
+
+    @property
+    def migrations(self):
+        """ Index of available migrations.
+        """
+        if self._objects is None:
+            self._objects = migrations.get_index(self.settings)
+        return self._objects
+
+    def reload(self):
+        self._objects = None
+
+    @property
+    def targets(self):
+        """ List of targets (migranite.targets.Target) or None.
+        """
+        return get_targets(self.settings)
+
+    def plan(self, names=None, force=False, target=None):
+        """ Plan of run, without running any migration code.
+
+        :names: list of migrations names (default all)
+        :force: as for `run(force=True)`
+        :target: target name
+
+        Return Plan, or dict {target name: Plan} if targets are set
+        in settings and `target` is not given.
+        """
+        return self._for_targets(target, lambda settings: Plan(
+            self.migrations, get_db(settings).last_results(), names, force))
+
+    def status(self, target=None):
+        """ Status of every available migration.
+
+        :target: target name
+
+        Return list of Status, or dict {target name: list} if targets
+        are set in settings and `target` is not given.
+        """
+        def status(settings):
+            last_results = get_db(settings).last_results()
+            result = []
+
+            for migration in self.migrations:
+                last = last_results.get((migration.num, migration.name))
+
+                if last is None:
+                    state = 'pending'
+                elif last.result:
+                    state = 'success'
+                else:
+                    state = 'failed'
+
+                result.append(Status(migration, state, last))
+
+            return result
+
+        return self._for_targets(target, status)
+
+    def run(self, names=None, force=False, jobs=1, async_limit=None,
+            profile=None, target_jobs=None, raise_errors=True):
+        """ Run migrations.
+
+        :names: list of migrations names (default all not succeeded)
+        :force: run specified migrations even if they succeeded,
+            ignored without `names`
+        :jobs: number of migrations running in parallel (default 1)
+        :async_limit: number of async migrations running at once
+        :profile: profiler mode, 'cprofile' or 'tracemalloc'
+        :target_jobs: number of targets migrated in parallel
+            (default from settings)
+        :raise_errors: raise MigrationFailed if any migration failed
+
+        Return RunResult.
+        """
+        aio.set_limit(async_limit)
+        profiler = self._get_profiler(profile)
+        targets = self.targets
+
+        try:
+            if targets is None:
+                reports = [self._run_target(self.settings, names, force, jobs,
+                                            profiler)]
+            else:
+                reports = self._run_targets(targets, names, force, jobs,
+                                            profiler, target_jobs)
+        finally:
+            aio.close()
+
+        result = RunResult(reports)
+
+        if raise_errors and not result.ok:
+            raise MigrationFailed(result)
+
+        return result
+
+    def _for_targets(self, target, func):
+        targets = self.targets
+
+        if targets is None:
+            return func(self.settings)
+
+        if target is None:
+            return {t.name: func(target_settings(self.settings, t)) for t in targets}
+
+        for t in targets:
+            if t.name == target:
+                return func(target_settings(self.settings, t))
+
+        from .exceptions import SettingsError
+        raise SettingsError("Target {!r} not found".format(target))
+
+    def _get_profiler(self, mode):
+        if mode is not None:
+            from .profiling import Profiler, get_profiles_dir
+            return Profiler(mode, get_profiles_dir(self.settings))
+
+    def _print(self, line, *args, **kwargs):
+        if self.output is not None:
+            print(line.format(*args, R=Style.RESET_ALL, **kwargs),
+                  file=self.output)
+
+    def _print_error(self, exc):
+        if self.output is not None:
+            traceback.print_exception(type(exc), exc, exc.__traceback__,
+                                      file=self.output)
+
+    def _run_target(self, settings, names, force, jobs, profiler, target=None):
+        """ Run migrations against one database.
+
+        The status is read after the database lock is acquired.
+        """
+        db = get_db(settings)
+
+        with _lock(settings, db) as lock:
+            plan = Plan(self.migrations, db.last_results(), names, force)
+            report = Report(plan, target)
+
+            if target is None:
+                for migration in plan.skipped:
+                    self._print("[{C}SKP{R}] {!s}", migration, C=Fore.YELLOW)
+
+            try:
+                self._run_migrations(db, plan.run, jobs, profiler, report, lock)
+            finally:
+                db.flush()
+
+        return report
+
+    def _run_targets(self, targets, names, force, jobs, profiler, target_jobs=None):
+        """ Run migrations against every target in thread pool.
+
+        Migrations modules are shared, so every module is executed once.
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        if target_jobs is None:
+            target_jobs = int(self.settings['database'].get('target_jobs', 4))
+
+        if profiler is not None:
+            # profiles are written per migration, targets go one by one
+            target_jobs = 1
+
+        self.migrations  # discover before threads start
+
+        def run_target(target):
+            try:
+                return self._run_target(target_settings(self.settings, target),
+                                        names, force, jobs, profiler, target)
+            except Exception as exc:
+                self._print_error(exc)
+                report = Report(None, target)
+                report.error = exc
+                return report
+
+        reports = []
+
+        with ThreadPoolExecutor(max(target_jobs, 1)) as executor:
+            futures = [executor.submit(run_target, t) for t in targets]
+
+            for done, future in enumerate(as_completed(futures), 1):
+                report = future.result()
+                reports.append(report)
+
+                if report.ok:
+                    self._print("[{C}PSS{R}] {}/{} {}: {} run, {} skipped",
+                                done, len(targets), report.target.name,
+                                len(report.runs), len(report.plan.skipped),
+                                C=Fore.GREEN)
+                else:
+                    self._print("[{C}ERR{R}] {}/{} {}: failed",
+                                done, len(targets), report.target.name,
+                                C=Fore.RED)
+
+        failed = sorted(r.target.name for r in reports if not r.ok)
+        self._print("{} targets, {} failed", len(targets), len(failed))
+
+        order = {t.name: n for n, t in enumerate(targets)}
+        return sorted(reports, key=lambda r: order[r.target.name])
+
+    def _run_migrations(self, db, found, jobs, profiler, report, lock=None):
+        """ Run migrations sequentially or in thread pool.
+
+        Without `depends_on` migration waits for all previous migrations
+        from `found`, with `depends_on` only for listed ones. Sequential
+        run stops on the first failed migration. Migrations are not started
+        after `lock` is lost.
+        """
+        if profiler is not None and profiler.mode == 'cprofile':
+            for migration in found:
+                if migration.is_async:
+                    raise MigraniteError(
+                        "cProfile can't profile async migration {}, "
+                        "use tracemalloc profiler".format(migration.file_name))
+
+        run_one = functools.partial(self._run_migration, db, profiler=profiler,
+                                    report=report, db_lock=threading.Lock(),
+                                    lock=lock)
+
+        if jobs <= 1:
+            for migration in found:
+                try:
+                    if not run_one(migration):
+                        break
+                except Exception as exc:
+                    self._add_error(report, migration, exc)
+                    break
+            return
+
+        dependencies = []
+        positions = {(m.num, m.name): n for n, m in enumerate(found)}
+        barrier = 0
+
+        for n, migration in enumerate(found):
+            if migration.depends_on is None:
+                # the previous migration without `depends_on` already waits
+                # for all before it, so wait for it and the ones after it
+                dependencies.append(set(range(barrier, n)))
+                barrier = n
+                continue
+
+            deps = set()
+
+            for dep_name in migration.depends_on:
+                dep = _resolve(self.migrations, str(dep_name))
+
+                if not dep < migration:
+                    raise DependencyError(
+                        "Migration {} depends on later migration {}"
+                        "".format(migration.file_name, dep.file_name))
+
+                position = positions.get((dep.num, dep.name))
+                if position is not None and position < n:
+                    deps.add(position)
+
+            dependencies.append(deps)
+
+        from .graph import run_graph
+
+        def on_skip(migration):
+            report.runs.append(MigrationRun(migration, None, None))
+            self._print("[{C}SKP{R}] {} (dependency failed)",
+                        _title(migration, report.target), C=Fore.YELLOW)
+
+        results, errors = run_graph(found, dependencies, run_one, jobs,
+                                    on_skip=on_skip)
+
+        # errors raised outside of migration code (e.g. by database)
+        recorded = {id(r.migration) for r in report.runs}
+
+        for migration, result, error in zip(found, results, errors):
+            if result is False and id(migration) not in recorded:
+                self._add_error(report, migration, error)
+
+    def _add_error(self, report, migration, exc):
+        report.runs.append(MigrationRun(migration, False, exc))
+        self._print_error(exc)
+        self._print("[{C}ERR{R}] {}", _title(migration, report.target),
+                    C=Fore.RED)
+
+    def _run_migration(self, db, migration, profiler=None, report=None,
+                       db_lock=None, lock=None):
+        target = report.target if report is not None else None
+        db_lock = db_lock or threading.Lock()
+
+        if getattr(lock, 'lost', False):
+            # other node may run migrations now
+            raise LockLost("Lock is lost, migration {} is not started"
+                           "".format(migration.file_name))
+
+        with db_lock:
+            context = Context(db, migration, target)
+
+        if context.checkpoint is None:
+            self._print("[{C}RUN{R}] {}", _title(migration, target), C=Fore.GREEN)
+        else:
+            self._print("[{C}RUN{R}] {} (resume from checkpoint)",
+                        _title(migration, target), C=Fore.GREEN)
+
+        measure = Measure()
+        profile = (profiler.profile(migration, target) if profiler
+                   else contextlib.ExitStack())
+        result, error = False, None
+
+        try:
+            with measure, profile:
+                migration.run(context)
+            result = True
+        except Exception as exc:
+            error = exc
+        finally:
+            extra = measure.as_dict()
+            extra['profile'] = getattr(profile, 'path', None)
+
+            with db_lock:
+                db.add(migration, result, extra)
+                if result:
+                    db.clear_checkpoint(migration)
+
+            if report is not None:
+                report.runs.append(MigrationRun(migration, result, error))
+
+        if not result:
+            self._print_error(error)
+            self._print("[{C}ERR{R}] {}", _title(migration, target), C=Fore.RED)
+
+        return result
+
+
+class Plan:
+    """ Migrations to run, made from one snapshot of last results.
+
+    Every selected migration is in one of lists: `pending` (never run),
+    `failed` (last run failed), `forced` (succeeded, but forced)
+    and `skipped` (succeeded).
+
+    :objects: migrations.Index
+    :last_results: dict from DBInterface.last_results
+    :migrations_names: list of migrations names (default all)
+    :force: run specified migrations if they already worked, ignored
+        without `migrations_names` like in `migranite run` (default False)
+    """
+    STATES = ('pending', 'failed', 'forced', 'skipped')
+
+    def __init__(self, objects, last_results, migrations_names=None, force=False):
+        self.last_results = last_results
+        self.pending = []
+        self.failed = []
+        self.forced = []
+        self.skipped = []
+        self._states = {}
+
+        if migrations_names is None:
+            selected = list(objects)
+            force = False
+        else:
+            selected = sorted({(m.num, m.name): m for m in (
+                _resolve(objects, mn) for mn in migrations_names)}.values())
+
+        for migration in selected:
+            last = self.last(migration)
+
+            if last is None:
+                state = 'pending'
+            elif not last.result:
+                state = 'failed'
+            elif force:
+                state = 'forced'
+            else:
+                state = 'skipped'
+
+            getattr(self, state).append(migration)
+            self._states[(migration.num, migration.name)] = state
+
+    @property
+    def run(self):
+        """ Migrations to run in order.
+        """
+        return sorted(self.pending + self.failed + self.forced)
+
+    @property
+    def needed(self):
+        return bool(self.run)
+
+    def last(self, migration):
+        return self.last_results.get((migration.num, migration.name))
+
+    def state(self, migration):
+        return self._states[(migration.num, migration.name)]
+
+    def as_dict(self):
+        def item(migration):
+            last = self.last(migration)
+            return {
+                'num': migration.num,
+                'name': migration.name,
+                'file': migration.file_name,
+                'short': migration.short,
+                'md5': migration.md5,
+                'state': self.state(migration),
+                'last': None if last is None else {
+                    'ts': last.ts.isoformat(),
+                    'result': last.result,
+                    'md5': last.md5,
+                },
+            }
+
+        result = {'needed': self.needed,
+                  'run': [item(m) for m in self.run]}
+        result.update((state, [m.file_name for m in getattr(self, state)])
+                      for state in self.STATES)
+        return result
+
+
+class Report:
+    """ Run of migrations against one database.
+
+    :plan: Plan of run or None if it was not made
+    :target: migranite.targets.Target or None
+    """
+    def __init__(self, plan, target=None):
+        self.plan = plan
+        self.target = target
+        self.runs = []
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and all(r.result for r in self.runs)
+
+    @property
+    def failed(self):
+        """ Runs of failed migrations.
+        """
+        return [r for r in self.runs if r.result is False]
+
+    def as_dict(self):
+        return {
+            'target': self.target.name if self.target is not None else None,
+            'ok': self.ok,
+            'error': str(self.error) if self.error is not None else None,
+            'runs': [{
+                'num': r.migration.num,
+                'name': r.migration.name,
+                'result': r.result,
+                'error': repr(r.error) if r.error is not None else None,
+            } for r in self.runs],
+        }
+
+
+class RunResult:
+    """ Result of `Migranite.run`: list of reports, one for every target.
+    """
+    def __init__(self, reports):
+        self.reports = reports
+
+    @property
+    def ok(self):
+        return all(r.ok for r in self.reports)
+
+    @property
+    def failed(self):
+        """ Reports with failed migrations or errors.
+        """
+        return [r for r in self.reports if not r.ok]
+
+    def __iter__(self):
+        return iter(self.reports)
+
+    def as_dict(self):
+        return {'ok': self.ok, 'reports': [r.as_dict() for r in self.reports]}
+
+
+def _resolve(objects, mn):
+    """ Find migration by name as it given in command line.
+    """
+    if '-' in mn and mn.split('-', 1)[0].isdigit():
+        num, name = mn.split('-', 1)
+        num = int(num)
+
+    elif mn.isdigit():
+        num, name = int(mn), None
+
+    else:
+        num, name = None, mn
+
+    found_migrations = migrations.find(objects, num, name)
+
+    if not found_migrations:
+        raise MigrationNotFound("Migration {!r} not found".format(mn))
+    elif len(found_migrations) > 1:
+        raise MigrationNotFound("More than one migration found for {!r}".format(mn))
+    else:
+        return found_migrations[0]
+
+
+@contextlib.contextmanager
+def _lock(settings, db):
+    """ Hold database lock, so only one process or node runs migrations.
+
+    Results are read after the lock is acquired, so waiting processes
+    skip migrations done by the previous holder.
+    """
+    if not settings['database'].get('lock', True):
+        yield
+        return
+
+    timeout = settings['database'].get('lock_timeout')
+
+    with db.lock(None if timeout is None else float(timeout)) as lock:
+        yield lock
+
+
+def _title(migration, target=None):
+    if target is None:
+        return str(migration)
+    else:
+        return "{}/{!s}".format(target.name, migration)
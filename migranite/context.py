@@ -0,0 +1,34 @@
+class Context:
+    """ Context of migration run.
+
+    It is passed to `run(context)` of migration if the function
+    takes an argument.
+
+    `target` is migranite.targets.Target when migrations run against
+    several databases, otherwise None.
+    """
+    def __init__(self, db, migration, target=None):
+        self.db = db
+        self.migration = migration
+        self.target = target
+        self._checkpoint = db.get_checkpoint(migration)
+
+    @property
+    def checkpoint(self):
+        """ Last saved checkpoint value or None.
+
+        Checkpoint is kept after failed or interrupted run, so the next
+        run can resume from it. It is removed after successful run.
+        """
+        return self._checkpoint
+
+    def save_checkpoint(self, value):
+        """ Save progress of migration.
+
+        Every call writes to the database (JSON backend rewrites
+        the checkpoints file), so save it once per batch of work.
+
+        :value: JSON-serializable value, e.g. last processed key
+        """
+        self.db.set_checkpoint(self.migration, value)
+        self._checkpoint = value
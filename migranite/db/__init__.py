@@ -1,14 +1,73 @@
-from .json import JSON
-from .mongo import Mongo
+import importlib
+
+ENTRY_POINTS_GROUP = 'migranite.backends'
+
+BACKENDS = {
+    'json': 'migranite.db.json:JSON',
+    'sqlite': 'migranite.db.sqlite:SQLite',
+    'mongo': 'migranite.db.mongo:Mongo',
+}
+
+
+def register(name, backend):
+    """ Register database backend.
+
+    :name: name for `backend` key in settings
+    :backend: DBInterface subclass or 'module:Class' string
+    """
+    BACKENDS[name] = backend
+
+
+def get_backend(name):
+    """ Get database backend class by name.
+
+    Backend modules are imported on first use. Backends from other
+    packages are registered with 'migranite.backends' entry points.
+    """
+    backend = BACKENDS.get(name)
+
+    if backend is None:
+        backend = _find_entry_point(name)
+        if backend is None:
+            from ..exceptions import SettingsError
+            raise SettingsError("Bad database backend: {!r}".format(name))
+
+    if isinstance(backend, str):
+        module_name, class_name = backend.split(':', 1)
+        backend = getattr(importlib.import_module(module_name), class_name)
+        BACKENDS[name] = backend
+
+    return backend
 
 
 def get(settings):
     """ Get database object.
     """
-    if settings['database']['backend'] == 'json':
-        return JSON(settings)
-    elif settings['database']['backend'] == 'mongo':
-        return Mongo(settings)
-    else:
-        raise RuntimeError("Bad database backend: {!r}"
-                           "".format(settings['database']))
+    return get_backend(settings['database']['backend'])(settings)
+
+
+def __getattr__(name):
+    # keep `from migranite.db import JSON` working without eager imports
+    for backend in BACKENDS.values():
+        if isinstance(backend, str) and backend.endswith(':' + name):
+            module_name = backend.split(':', 1)[0]
+            return getattr(importlib.import_module(module_name), name)
+
+    raise AttributeError(name)
+
+
+def _find_entry_point(name):
+    try:
+        from importlib.metadata import entry_points
+    except ImportError:  # pragma: no cover
+        return None
+
+    eps = entry_points()
+
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=ENTRY_POINTS_GROUP, name=name)
+    else:  # pragma: no cover
+        eps = [ep for ep in eps.get(ENTRY_POINTS_GROUP, []) if ep.name == name]
+
+    for ep in eps:
+        return ep.load()
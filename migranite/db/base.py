@@ -1,10 +1,75 @@
 import abc
 from collections import namedtuple
+from datetime import datetime
 
 
+EXTRA_FIELDS = ('duration', 'cpu', 'memory', 'profile')
+
 MigrationResult = namedtuple(
     'MigrationResult',
-    ('ts', 'num', 'name', 'short', 'long', 'source', 'md5', 'result'))
+    ('ts', 'num', 'name', 'short', 'long', 'source', 'md5', 'result') +
+    EXTRA_FIELDS)
+
+MigrationResult.__new__.__defaults__ = (None,) * len(EXTRA_FIELDS)
+
+
+def loaded(result):
+    """ MigrationResult with `long` and `source` of result loaded.
+    """
+    if isinstance(result, MigrationResult):
+        return result
+
+    return MigrationResult(*(getattr(result, f) for f in MigrationResult._fields))
+
+
+def parse_datetime(value):
+    """ Parse datetime in ISO 8601 format written by `isoformat`.
+    """
+    try:
+        return datetime.fromisoformat(value)
+    except (AttributeError, ValueError):
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+class LazyMigrationResult:
+    """ MigrationResult with `long` and `source` loaded on first access.
+
+    :load: callable without arguments, must return dict with `long`
+        and `source` keys (or None if they are lost)
+    """
+    __slots__ = ('ts', 'num', 'name', 'short', 'md5', 'result',
+                 '_load', '_heavy') + EXTRA_FIELDS
+
+    def __init__(self, ts, num, name, short, md5, result, load, **extra):
+        self.ts = ts
+        self.num = num
+        self.name = name
+        self.short = short
+        self.md5 = md5
+        self.result = result
+        self._load = load
+        self._heavy = None
+
+        for field in EXTRA_FIELDS:
+            setattr(self, field, extra.get(field))
+
+    @property
+    def long(self):
+        return self._get_heavy().get('long')
+
+    @property
+    def source(self):
+        return self._get_heavy().get('source')
+
+    def _get_heavy(self):
+        if self._heavy is None:
+            self._heavy = self._load() or {}
+        return self._heavy
+
+    def __repr__(self):
+        return "<{} {!s}-{!s}>".format(
+            self.__class__.__name__, self.num, self.name)
 
 
 class DBInterface(metaclass=abc.ABCMeta):
@@ -17,9 +82,20 @@ class DBInterface(metaclass=abc.ABCMeta):
         """ List of all results (MigrationResult).
         """
 
+    def full_results(self):
+        """ List of all results with `long` and `source` loaded.
+
+        Items of `results` may load them on access with one query
+        per result, use it to show them for many results.
+        Return `results` by default.
+        """
+        return self.results
+
     @abc.abstractmethod
-    def add(self, migration, result):
+    def add(self, migration, result, extra=None):
         """ Add migration result to database.
+
+        :extra: dict with optional fields of result (EXTRA_FIELDS)
         """
 
     @abc.abstractmethod
@@ -34,6 +110,53 @@ class DBInterface(metaclass=abc.ABCMeta):
         """ Return True if last migration run is success.
         """
 
+    @abc.abstractmethod
+    def last_results(self):
+        """ Last result for every migration in database.
+
+        Return dict {(num, name): MigrationResult}.
+        """
+
+    @abc.abstractmethod
+    def get_checkpoint(self, migration):
+        """ Return last saved checkpoint value for migration or None.
+
+        Checkpoint saved by other version of migration (md5 is changed)
+        is removed, the migration starts from the beginning.
+        """
+
+    @abc.abstractmethod
+    def set_checkpoint(self, migration, value):
+        """ Save checkpoint value for migration.
+        """
+
+    @abc.abstractmethod
+    def clear_checkpoint(self, migration):
+        """ Remove checkpoint of migration.
+        """
+
+    def flush(self):
+        """ Write buffered results.
+
+        Do nothing by default.
+        """
+
+    def compact(self):
+        """ Compact database storage.
+
+        It is called with the lock held. Do nothing by default.
+        """
+
+    def lock(self, timeout=None):
+        """ Lock for running migrations, shared by all processes and nodes.
+
+        Return context manager, it raises migranite.lock.LockTimeout
+        if the lock is not acquired in `timeout` seconds.
+        Do not lock by default.
+        """
+        import contextlib
+        return contextlib.nullcontext()
+
 
 class DBSimpleBase(DBInterface):
     def __init__(self, settings):
@@ -50,3 +173,9 @@ class DBSimpleBase(DBInterface):
             return False
         else:
             return results[-1].result
+
+    def last_results(self):
+        last = {}
+        for r in self.results:
+            last[(r.num, r.name)] = r
+        return last
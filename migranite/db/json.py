@@ -1,52 +1,225 @@
-import sys
+import contextlib
+import os
+import threading
 
 import json
 from datetime import datetime
 
-import dateutil.parser
-
-from .base import DBSimpleBase, MigrationResult
+from .base import (
+    EXTRA_FIELDS,
+    DBSimpleBase,
+    MigrationResult,
+    loaded,
+    parse_datetime,
+)
+from .sources import FileSources
+from .table import ResultsTable
+from ..exceptions import SettingsError
+from ..lock import FileLock
+from ..log import logger
+from ..utils import atomic_write
 
 
 class JSON(DBSimpleBase):
+    """ JSON file database.
+
+    With `journal = true` in settings every result is appended to the file
+    as one JSON line, otherwise the whole file is rewritten as JSON array.
+    Both formats are readable in both modes.
+
+    With `sources` in settings sources of migrations are stored once
+    per md5 in this directory instead of every result.
+
+    Checkpoints are stored in the file with `.checkpoints` suffix,
+    runs are locked with the file with `.lock` suffix.
+    """
     _results = None
+    _lines_size = None
+    _checkpoints = None
+    _reader = None
 
     def __init__(self, settings):
         super().__init__(settings)
         if 'path' not in settings['database']:
-            print("Path to json file not set in settings.", file=sys.stderr)
-            sys.exit(1)
+            raise SettingsError("Path to json file not set in settings.")
 
         self.path = settings['database']['path']
+        self.checkpoints_path = self.path + '.checkpoints'
+        self._checkpoints_lock = threading.Lock()
+        self.journal = settings['database'].get('journal', False)
+
+        if settings['database'].get('sources'):
+            self.sources = FileSources(
+                settings['database']['sources'],
+                compress=settings['database'].get('compress', False))
+        else:
+            self.sources = None
 
     @property
     def results(self):
         if self._results is None:
+            results = ResultsTable(self._load_heavy)
+
+            for offset, raw in self._read():
+                results.append(self._result_from_json(raw), offset)
+
+            self._results = results
+
+        return self._results
+
+    def add(self, migration, result, extra=None):
+        r = self._result_from_migration(migration, result, extra)
+        results = self.results
+
+        if self.journal and self._lines_size is not None:
+            offset = self._lines_size
+            self._append_result(r)
+            results.append(r, offset)
+        else:
+            results.append(r)
+            self._save_results()
+
+    def find(self, migration):
+        return [self.results[n]
+                for n in self.results.indexes(migration.num, migration.name)]
+
+    def last_results(self):
+        return {key: self.results[n]
+                for key, n in self.results.last_indexes().items()}
+
+    def get_checkpoint(self, migration):
+        with self._checkpoints_lock:
+            key = self._checkpoint_key(migration)
+            checkpoint = self.checkpoints.get(key)
+
+            if checkpoint and checkpoint['md5'] != migration.md5:
+                del self.checkpoints[key]
+                self._save_checkpoints()
+                return None
+
+            return checkpoint and checkpoint['value']
+
+    def set_checkpoint(self, migration, value):
+        with self._checkpoints_lock:
+            self.checkpoints[self._checkpoint_key(migration)] = {
+                'ts': datetime.now().isoformat(sep='T'),
+                'md5': migration.md5,
+                'value': value,
+            }
+            self._save_checkpoints()
+
+    def clear_checkpoint(self, migration):
+        with self._checkpoints_lock:
+            if self.checkpoints.pop(self._checkpoint_key(migration), None):
+                self._save_checkpoints()
+
+    @property
+    def checkpoints(self):
+        if self._checkpoints is None:
             try:
-                with open(self.path, 'r', encoding='utf8') as f:
-                    raw = json.load(f)
+                with open(self.checkpoints_path, 'r', encoding='utf8') as f:
+                    self._checkpoints = json.load(f)
             except FileNotFoundError:
-                raw = []
-            except json.decoder.JSONDecodeError:
-                raise RuntimeError("Bad {} format".format(self.path))
+                self._checkpoints = {}
+            except ValueError:
+                raise RuntimeError("Bad {} format"
+                                   "".format(self.checkpoints_path))
 
-            results = []
+        return self._checkpoints
 
-            for raw_obj in raw:
-                result = self._result_from_json(raw_obj)
-                results.append(result)
+    @staticmethod
+    def _checkpoint_key(migration):
+        return '{m.num}-{m.name}'.format(m=migration)
 
-            self._results = results
+    def _save_checkpoints(self):
+        with atomic_write(self.checkpoints_path, 'w', encoding='utf8') as f:
+            json.dump(self.checkpoints, f, indent=2)
 
-        return self._results
+    def lock(self, timeout=None):
+        return FileLock(self.path + '.lock', timeout)
 
-    def add(self, migration, result):
-        r = self._result_from_migration(migration, result)
-        self.results.append(r)
+    def compact(self):
+        # results and size of journal may be read before the lock is held
+        self._results = None
+        self.results
         self._save_results()
 
+    def _read(self):
+        """ Iterate over (offset, raw result) from file.
+
+        Offset is -1 for JSON array files.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._lines_size = 0
+            return
+
+        with f:
+            head = f.read(1024).lstrip()
+            f.seek(0)
+
+            if head.startswith(b'['):
+                self._lines_size = None
+                try:
+                    raw = json.loads(f.read().decode('utf8'))
+                except ValueError:
+                    raise RuntimeError("Bad {} format".format(self.path))
+
+                for r in raw:
+                    yield -1, r
+            else:
+                yield from self._read_lines(f)
+
+    def _read_lines(self, f):
+        """ Stream (offset, raw result) from JSON lines file.
+
+        Torn last line (crash in the middle of write) is ignored
+        and will be truncated by the next write.
+        """
+        size = 0
+        broken = None
+
+        for n, line in enumerate(f, 1):
+            if broken is not None:
+                raise RuntimeError("Bad {} format in line {}"
+                                   "".format(self.path, broken))
+
+            if not line.endswith(b'\n'):
+                broken = n
+                continue
+
+            if line.strip():
+                try:
+                    raw = json.loads(line.decode('utf8'))
+                except ValueError:
+                    broken = n
+                    continue
+
+                yield size, raw
+
+            size += len(line)
+
+        if broken is not None:
+            logger.warning("Ignore broken last line in %s", self.path)
+
+        self._lines_size = size
+
+    def _append_result(self, result):
+        line = json.dumps(self._result_to_json(result)) + '\n'
+        mode = 'r+b' if os.path.exists(self.path) else 'wb'
+
+        with open(self.path, mode) as f:
+            f.truncate(self._lines_size)
+            f.seek(self._lines_size)
+            f.write(line.encode('utf8'))
+            f.flush()
+            os.fsync(f.fileno())
+            self._lines_size = f.tell()
+
     @staticmethod
-    def _result_from_migration(migration, result):
+    def _result_from_migration(migration, result, extra=None):
+        extra = extra or {}
         return MigrationResult(
             ts=datetime.now(),
             num=migration.num,
@@ -56,35 +229,113 @@ class JSON(DBSimpleBase):
             source=migration.source,
             md5=migration.md5,
             result=result,
+            **{f: extra.get(f) for f in EXTRA_FIELDS}
         )
 
     @staticmethod
     def _result_from_json(raw):
         return MigrationResult(
-            ts=dateutil.parser.parse(raw['ts']),
+            ts=parse_datetime(raw['ts']),
             num=int(raw['num']),
             name=raw['name'],
             short=raw['short'],
-            long=raw['long'],
-            source=raw['source'],
+            long=raw.get('long'),
+            source=raw.get('source'),
             md5=raw['md5'],
             result=raw['result'],
+            **{f: raw.get(f) for f in EXTRA_FIELDS}
         )
 
-    @staticmethod
-    def _result_to_json(result):
-        return {
+    def _load_heavy(self, offset, md5):
+        """ Load `long` and `source` of result from file or sources.
+        """
+        if offset >= 0:
+            if self._reader is not None:
+                self._reader.seek(offset)
+                raw = json.loads(self._reader.readline().decode('utf8'))
+            else:
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    raw = json.loads(f.readline().decode('utf8'))
+
+            if 'source' in raw:
+                return {'long': raw.get('long'), 'source': raw['source']}
+
+        if self.sources is not None:
+            return self.sources.get(md5)
+
+    def _result_to_json(self, result):
+        raw = {
             'ts': result.ts.isoformat(sep='T'),
             'num': result.num,
             'name': result.name,
             'short': result.short,
-            'long': result.long,
-            'source': result.source,
             'md5': result.md5,
             'result': result.result,
         }
 
+        for field in EXTRA_FIELDS:
+            if getattr(result, field) is not None:
+                raw[field] = getattr(result, field)
+
+        if self.sources is None:
+            raw['long'] = result.long
+            raw['source'] = result.source
+        elif result.md5 not in self.sources and result.source is not None:
+            self.sources.put(result.md5, result.source, result.long)
+
+        return raw
+
+    def full_results(self):
+        with self._reading():
+            return [loaded(r) for r in self.results]
+
+    @contextlib.contextmanager
+    def _reading(self):
+        """ Read results by offsets with one file handle.
+        """
+        try:
+            self._reader = open(self.path, 'rb')
+        except FileNotFoundError:
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            self._reader.close()
+            self._reader = None
+
     def _save_results(self):
-        raw = [self._result_to_json(r) for r in self.results]
-        with open(self.path, 'w', encoding='utf8') as f:
-            json.dump(raw, f, indent=2)
+        # results loaded by offsets are read from the old file
+        # while the new one is written
+        with self._reading():
+            if self.journal:
+                self._save_lines()
+            else:
+                raw = [self._result_to_json(r) for r in self.results]
+
+                with atomic_write(self.path, 'w', encoding='utf8') as f:
+                    json.dump(raw, f, indent=2)
+
+                self._lines_size = None
+
+                for n, r in enumerate(raw):
+                    if 'source' in r:
+                        heavy = {'long': r['long'], 'source': r['source']}
+                    else:
+                        heavy = None
+                    self.results.set_offset(n, -1, heavy)
+
+    def _save_lines(self):
+        offsets = []
+
+        with atomic_write(self.path, 'wb') as f:
+            for r in self.results:
+                offsets.append(f.tell())
+                f.write((json.dumps(self._result_to_json(r)) + '\n').encode('utf8'))
+
+            self._lines_size = f.tell()
+
+        for n, offset in enumerate(offsets):
+            self.results.set_offset(n, offset)
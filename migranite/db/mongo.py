@@ -1,6 +1,8 @@
-import sys
+import threading
+import time
 
-from datetime import datetime
+import functools
+from datetime import datetime, timedelta, timezone
 
 try:
     import pymongo
@@ -8,61 +10,239 @@ try:
 except ImportError:
     PYMONGO = False
 
-from .base import DBInterface, MigrationResult
+from .base import (
+    EXTRA_FIELDS,
+    DBInterface,
+    LazyMigrationResult,
+    MigrationResult,
+)
+from ..exceptions import LockTimeout, SettingsError
+from ..lock import get_owner
+from ..log import logger
+from .sources import pack, unpack
+
+
+LIGHT_FIELDS = ('ts', 'num', 'name', 'short', 'md5', 'result') + EXTRA_FIELDS
+LIGHT_PROJECTION = {f: 1 for f in LIGHT_FIELDS}
+
+# settings key -> MongoClient keyword argument
+CLIENT_OPTIONS = {
+    'replica_set': 'replicaSet',
+    'tls': 'tls',
+    'tls_ca_file': 'tlsCAFile',
+    'tls_certificate_key_file': 'tlsCertificateKeyFile',
+    'tls_allow_invalid_certificates': 'tlsAllowInvalidCertificates',
+    'username': 'username',
+    'password': 'password',
+    'auth_source': 'authSource',
+    'w': 'w',
+    'j': 'journal',
+    'wtimeout': 'wTimeoutMS',
+}
+
+_clients = {}
+_indexed = set()
+_clients_lock = threading.Lock()
+
+
+def get_client(uri=None, host='localhost', port=27017, **options):
+    """ Get MongoClient shared in the process.
+
+    Clients are pooled, one for every set of connection arguments.
+    """
+    key = (uri, host, port, tuple(sorted(options.items())))
+
+    with _clients_lock:
+        client = _clients.get(key)
+
+        if client is None:
+            if uri:
+                client = pymongo.MongoClient(uri, **options)
+            else:
+                client = pymongo.MongoClient(host, port, **options)
+
+            _clients[key] = client
+
+    return client
 
 
 class Mongo(DBInterface):
+    """ MongoDB database.
+
+    With `sources` in settings sources of migrations are stored once
+    per md5 in this collection instead of every result.
+
+    Reads transfer only light fields, `long` and `source`
+    are fetched on first access.
+
+    Checkpoints are stored in the collection with `_checkpoints` suffix,
+    the run lease in the collection with `_lock` suffix.
+
+    With `buffer = true` in settings results are kept in memory and
+    written by one `insert_many` in `flush`.
+    """
     _collection = None
 
     def __init__(self, settings):
         if not PYMONGO:
-            print("pymongo not installed.", file=sys.stderr)
-            sys.exit(1)
+            raise SettingsError("pymongo not installed.")
 
         if not settings['database'].get('name'):
-            print("Database name not set in settings.", file=sys.stderr)
-            sys.exit(1)
+            raise SettingsError("Database name not set in settings.")
 
         self._settings = settings
+        self.uri = settings['database'].get('uri')
         self.host = settings['database'].get('host', 'localhost')
         self.port = int(settings['database'].get('port', 27017))
+        self.client_options = {
+            CLIENT_OPTIONS[k]: v for k, v in settings['database'].items()
+            if k in CLIENT_OPTIONS}
         self.db_name = settings['database']['name']
         self.collection_name = settings['database'].get('collection', 'migrations')
+        self.sources_name = settings['database'].get('sources')
+        self.compress = settings['database'].get('compress', False)
+        self.buffer = settings['database'].get('buffer', False)
+        self.lock_ttl = int(settings['database'].get('lock_ttl', 60))
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+
+    @property
+    def client(self):
+        return get_client(self.uri, self.host, self.port, **self.client_options)
 
     @property
     def collection(self):
         if self._collection is None:
-            client = pymongo.MongoClient(self.host, self.port)
-            db = client[self.db_name]
-            self._collection = db[self.collection_name]
-            self._collection.create_index([('ts', 1)])
-            self._collection.create_index([('num', 1), ('name', 1)])
+            collection = self.client[self.db_name][self.collection_name]
+            key = (id(self.client), self.db_name, self.collection_name)
+
+            if key not in _indexed:
+                collection.create_index([('ts', 1)])
+                collection.create_index([('num', 1), ('name', 1)])
+                _indexed.add(key)
+
+            self._collection = collection
 
         return self._collection
 
+    @property
+    def sources(self):
+        if self.sources_name:
+            return self.collection.database[self.sources_name]
+
+    @property
+    def checkpoints(self):
+        return self.collection.database[self.collection_name + '_checkpoints']
+
     @property
     def results(self):
-        docs = self.collection.find().sort([('ts', 1)])
+        docs = self.collection.find({}, LIGHT_PROJECTION).sort([('ts', 1)])
+        return [self._result_from_doc(doc) for doc in docs]
+
+    def full_results(self):
+        docs = list(self.collection.find({}).sort([('ts', 1)]))
+        self._load_sources(docs)
         return [self._result_from_doc(doc) for doc in docs]
 
-    def add(self, migration, result):
-        doc = self._doc_from_migration(migration, result)
-        self.collection.insert(doc)
+    def add(self, migration, result, extra=None):
+        doc = self._doc_from_migration(migration, result, extra)
+
+        with self._buffer_lock:
+            self._buffer.append(doc)
+
+        if not self.buffer:
+            self.flush()
+
+    def flush(self):
+        with self._buffer_lock:
+            docs, self._buffer = self._buffer, []
+
+        if not docs:
+            return
+
+        if self.sources is not None:
+            sources = {}
+
+            for doc in docs:
+                sources[doc['md5']] = pack(
+                    doc.pop('source'), doc.pop('long'), self.compress)
+
+            self.sources.bulk_write([
+                pymongo.UpdateOne({'_id': md5},
+                                  {'$setOnInsert': {'data': data}},
+                                  upsert=True)
+                for md5, data in sources.items()
+            ], ordered=False)
+
+        if len(docs) == 1:
+            self.collection.insert_one(docs[0])
+        else:
+            self.collection.insert_many(docs)
 
     def find(self, migration):
         docs = self.collection.find({
             'num': migration.num,
             'name': migration.name,
-        }).sort([('ts', 1)])
+        }, LIGHT_PROJECTION).sort([('ts', 1)])
         return [self._result_from_doc(doc) for doc in docs]
 
     def success(self, migration):
         results = self.find(migration)
         return results and results[-1].result
 
+    def last_results(self):
+        group = {f: {'$last': '$' + f} for f in LIGHT_FIELDS}
+        group['_id'] = {'num': '$num', 'name': '$name'}
+        group['doc_id'] = {'$last': '$_id'}
+
+        docs = self.collection.aggregate([
+            {'$sort': {'ts': 1}},
+            {'$group': group},
+        ])
+
+        results = {}
+
+        for doc in docs:
+            doc['_id'] = doc.pop('doc_id')
+            r = self._result_from_doc(doc)
+            results[(r.num, r.name)] = r
+
+        return results
+
+    def get_checkpoint(self, migration):
+        doc = self.checkpoints.find_one(
+            {'_id': self._checkpoint_id(migration)})
+
+        if doc and doc.get('md5') != migration.md5:
+            self.clear_checkpoint(migration)
+            return None
+
+        return doc and doc['value']
+
+    def set_checkpoint(self, migration, value):
+        self.flush()
+        self.checkpoints.update_one(
+            {'_id': self._checkpoint_id(migration)},
+            {'$set': {'ts': datetime.now(),
+                      'md5': migration.md5,
+                      'value': value}},
+            upsert=True,
+        )
+
+    def clear_checkpoint(self, migration):
+        self.checkpoints.delete_one({'_id': self._checkpoint_id(migration)})
+
+    def lock(self, timeout=None):
+        return Lease(self.collection.database[self.collection_name + '_lock'],
+                     ttl=self.lock_ttl, timeout=timeout)
+
     @staticmethod
-    def _doc_from_migration(migration, result):
-        return {
+    def _checkpoint_id(migration):
+        return '{m.num}-{m.name}'.format(m=migration)
+
+    @staticmethod
+    def _doc_from_migration(migration, result, extra=None):
+        doc = {
             'ts': datetime.now(),
             'num': migration.num,
             'name': migration.name,
@@ -73,8 +253,26 @@ class Mongo(DBInterface):
             'result': result,
         }
 
-    @staticmethod
-    def _result_from_doc(doc):
+        for field in EXTRA_FIELDS:
+            if extra and extra.get(field) is not None:
+                doc[field] = extra[field]
+
+        return doc
+
+    def _result_from_doc(self, doc):
+        if 'source' not in doc:
+            return LazyMigrationResult(
+                ts=doc['ts'],
+                num=doc['num'],
+                name=doc['name'],
+                short=doc['short'],
+                md5=doc['md5'],
+                result=doc['result'],
+                load=functools.partial(self._load_source,
+                                       doc['_id'], doc['md5']),
+                **{f: doc.get(f) for f in EXTRA_FIELDS}
+            )
+
         return MigrationResult(
             ts=doc['ts'],
             num=doc['num'],
@@ -84,4 +282,137 @@ class Mongo(DBInterface):
             source=doc['source'],
             md5=doc['md5'],
             result=doc['result'],
+            **{f: doc.get(f) for f in EXTRA_FIELDS}
         )
+
+    def _load_sources(self, docs):
+        """ Set `long` and `source` of docs from sources with one query.
+        """
+        missing = [doc for doc in docs if 'source' not in doc]
+        sources = {}
+
+        if missing and self.sources is not None:
+            md5s = list({doc['md5'] for doc in missing})
+            for doc in self.sources.find({'_id': {'$in': md5s}}):
+                sources[doc['_id']] = unpack(bytes(doc['data']))
+
+        for doc in missing:
+            heavy = sources.get(doc['md5']) or {}
+            doc['long'] = heavy.get('long')
+            doc['source'] = heavy.get('source')
+
+    def _load_source(self, _id, md5):
+        if self.sources is not None:
+            doc = self.sources.find_one({'_id': md5})
+            if doc is not None:
+                return unpack(bytes(doc['data']))
+
+        return self.collection.find_one({'_id': _id},
+                                        {'_id': 0, 'source': 1, 'long': 1})
+
+
+class Lease:
+    """ Lock of migrations run for all nodes using one database.
+
+    Lock is a document with owner and expiration time. The owner
+    prolongs it from heartbeat thread every third of `ttl`, so lease
+    of crashed process expires in `ttl` seconds and other node takes it.
+    If the lease is not prolonged in time or is taken by other node,
+    `lost` is set and new migrations must not be started.
+
+    :collection: pymongo collection for lease documents
+    :name: lease document id
+    :ttl: lease lifetime in seconds
+    :timeout: seconds to wait, None to wait forever
+    """
+    def __init__(self, collection, name='run', ttl=60, timeout=None):
+        self.collection = collection
+        self.name = name
+        self.ttl = ttl
+        self.timeout = timeout
+        self.owner = get_owner()
+        self.lost = False
+        self._expires = None
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def acquire(self):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        waiting = False
+
+        while not self._try_acquire():
+            if not waiting:
+                doc = self.collection.find_one({'_id': self.name}) or {}
+                logger.info("Waiting for lock held by %s",
+                            doc.get('owner', 'unknown'))
+                waiting = True
+
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeout("Lock {!r} is not acquired in {} seconds"
+                                  "".format(self.name, self.timeout))
+
+            time.sleep(min(self.ttl / 4, 1))
+
+        self.lost = False
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True,
+                                           name='migranite-lease')
+        self._heartbeat.start()
+
+    def release(self):
+        if self._heartbeat is None:
+            return
+
+        self._stop.set()
+        self._heartbeat.join()
+        self._heartbeat = None
+        self.collection.delete_one({'_id': self.name, 'owner': self.owner})
+
+    def _try_acquire(self):
+        now = datetime.now(timezone.utc)
+        expires = time.monotonic() + self.ttl
+
+        try:
+            self.collection.update_one(
+                {'_id': self.name,
+                 '$or': [{'expires': {'$lt': now}}, {'owner': self.owner}]},
+                {'$set': {'owner': self.owner,
+                          'ts': now,
+                          'expires': now + timedelta(seconds=self.ttl)}},
+                upsert=True,
+            )
+        except pymongo.errors.DuplicateKeyError:
+            return False
+
+        self._expires = expires
+        return True
+
+    def _beat(self):
+        while not self._stop.wait(self.ttl / 3):
+            now = datetime.now(timezone.utc)
+            expires = time.monotonic() + self.ttl
+
+            try:
+                result = self.collection.update_one(
+                    {'_id': self.name, 'owner': self.owner},
+                    {'$set': {'expires': now + timedelta(seconds=self.ttl)}})
+            except pymongo.errors.PyMongoError as exc:
+                logger.warning("Lock %r is not prolonged: %s", self.name, exc)
+
+                if time.monotonic() < self._expires:
+                    continue
+            else:
+                if result.matched_count:
+                    self._expires = expires
+                    continue
+
+            logger.error("Lock %r is lost", self.name)
+            self.lost = True
+            return
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,50 @@
+import json
+import os
+import zlib
+
+from ..utils import atomic_write
+
+
+def pack(source, long, compress=False):
+    """ Pack migration source and long description to bytes.
+    """
+    data = json.dumps({'source': source, 'long': long}).encode('utf8')
+    return zlib.compress(data) if compress else data
+
+
+def unpack(data):
+    """ Unpack bytes from `pack`.
+
+    Return dict with `source` and `long` keys.
+    """
+    if not data.startswith(b'{'):
+        data = zlib.decompress(data)
+
+    return json.loads(data.decode('utf8'))
+
+
+class FileSources:
+    """ Directory with sources of migrations, one file per md5.
+    """
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.compress = compress
+
+    def __contains__(self, md5):
+        return os.path.exists(os.path.join(self.path, md5))
+
+    def get(self, md5):
+        try:
+            with open(os.path.join(self.path, md5), 'rb') as f:
+                return unpack(f.read())
+        except FileNotFoundError:
+            return None
+
+    def put(self, md5, source, long):
+        if md5 in self:
+            return
+
+        path = os.path.join(self.path, md5)
+        os.makedirs(self.path, exist_ok=True)
+        with atomic_write(path, 'wb') as f:
+            f.write(pack(source, long, self.compress))
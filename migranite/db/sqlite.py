@@ -0,0 +1,225 @@
+import functools
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from .base import (
+    EXTRA_FIELDS,
+    DBInterface,
+    LazyMigrationResult,
+    MigrationResult,
+    parse_datetime,
+)
+from ..exceptions import SettingsError
+from ..lock import FileLock
+from .sources import pack, unpack
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TEXT NOT NULL,
+    num INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    short TEXT,
+    long TEXT,
+    source TEXT,
+    md5 TEXT,
+    result INTEGER NOT NULL,
+    duration REAL,
+    cpu REAL,
+    memory INTEGER,
+    profile TEXT
+);
+
+CREATE INDEX IF NOT EXISTS results_num_name_ts ON results (num, name, ts);
+
+CREATE TABLE IF NOT EXISTS sources (
+    md5 TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    num INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    md5 TEXT,
+    value TEXT,
+    PRIMARY KEY (num, name)
+);
+"""
+
+LIGHT_COLUMNS = ('id', 'ts', 'num', 'name', 'short', 'md5', 'result') + EXTRA_FIELDS
+
+
+class SQLite(DBInterface):
+    """ SQLite database.
+
+    Database works in WAL mode and every result is written in its own
+    transaction. With `sources = true` in settings sources of migrations
+    are stored once per md5 in separate table. Runs are locked with
+    the file with `.lock` suffix.
+    """
+    _connection = None
+
+    def __init__(self, settings):
+        if 'path' not in settings['database']:
+            raise SettingsError("Path to sqlite file not set in settings.")
+
+        self._settings = settings
+        self.path = settings['database']['path']
+        self.dedup_sources = bool(settings['database'].get('sources'))
+        self.compress = settings['database'].get('compress', False)
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self):
+        with self._lock:
+            if self._connection is None:
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.row_factory = sqlite3.Row
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('PRAGMA synchronous=NORMAL')
+                connection.executescript(SCHEMA)
+                self._connection = connection
+
+            return self._connection
+
+    def _query(self, sql, *params):
+        with self._lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    @property
+    def results(self):
+        rows = self._query(
+            "SELECT {} FROM results ORDER BY id".format(', '.join(LIGHT_COLUMNS)))
+        return [self._result_from_row(row) for row in rows]
+
+    def full_results(self):
+        rows = self._query(
+            "SELECT results.*, sources.data FROM results LEFT JOIN sources "
+            "ON results.source IS NULL AND sources.md5 = results.md5 "
+            "ORDER BY results.id")
+        sources = {}
+        results = []
+
+        for row in rows:
+            if row['source'] is not None:
+                heavy = {'long': row['long'], 'source': row['source']}
+            elif row['data'] is not None:
+                if row['md5'] not in sources:
+                    sources[row['md5']] = unpack(bytes(row['data']))
+                heavy = sources[row['md5']]
+            else:
+                heavy = {}
+
+            results.append(MigrationResult(
+                ts=parse_datetime(row['ts']),
+                num=row['num'],
+                name=row['name'],
+                short=row['short'],
+                long=heavy.get('long'),
+                source=heavy.get('source'),
+                md5=row['md5'],
+                result=bool(row['result']),
+                **{f: row[f] for f in EXTRA_FIELDS}
+            ))
+
+        return results
+
+    def add(self, migration, result, extra=None):
+        extra = extra or {}
+        source, long = migration.source, migration.long
+
+        with self._lock, self.connection:
+            if self.dedup_sources:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO sources (md5, data) VALUES (?, ?)",
+                    (migration.md5, pack(source, long, self.compress)))
+                source = long = None
+
+            self.connection.execute(
+                "INSERT INTO results (ts, num, name, short, long, source, md5, "
+                "result, {}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, {})".format(
+                    ', '.join(EXTRA_FIELDS), ', '.join('?' * len(EXTRA_FIELDS))),
+                (datetime.now().isoformat(sep='T'), migration.num, migration.name,
+                 migration.short, long, source, migration.md5, bool(result)) +
+                tuple(extra.get(f) for f in EXTRA_FIELDS))
+
+    def find(self, migration):
+        rows = self._query(
+            "SELECT {} FROM results WHERE num = ? AND name = ? "
+            "ORDER BY ts, id".format(', '.join(LIGHT_COLUMNS)),
+            migration.num, migration.name)
+        return [self._result_from_row(row) for row in rows]
+
+    def success(self, migration):
+        rows = self._query(
+            "SELECT result FROM results WHERE num = ? AND name = ? "
+            "ORDER BY ts DESC, id DESC LIMIT 1",
+            migration.num, migration.name)
+        return bool(rows and rows[0]['result'])
+
+    def last_results(self):
+        rows = self._query(
+            "SELECT {} FROM results JOIN ("
+            "SELECT MAX(id) AS last_id FROM results GROUP BY num, name"
+            ") ON id = last_id".format(', '.join(LIGHT_COLUMNS)))
+
+        results = (self._result_from_row(row) for row in rows)
+        return {(r.num, r.name): r for r in results}
+
+    def get_checkpoint(self, migration):
+        rows = self._query(
+            "SELECT md5, value FROM checkpoints WHERE num = ? AND name = ?",
+            migration.num, migration.name)
+
+        if rows and rows[0]['md5'] != migration.md5:
+            self.clear_checkpoint(migration)
+            return None
+
+        return json.loads(rows[0]['value']) if rows else None
+
+    def set_checkpoint(self, migration, value):
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (num, name, ts, md5, value) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (migration.num, migration.name, datetime.now().isoformat(sep='T'),
+                 migration.md5, json.dumps(value)))
+
+    def clear_checkpoint(self, migration):
+        with self._lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM checkpoints WHERE num = ? AND name = ?",
+                (migration.num, migration.name))
+
+    def lock(self, timeout=None):
+        return FileLock(self.path + '.lock', timeout)
+
+    def compact(self):
+        with self._lock:
+            self.connection.execute('VACUUM')
+
+    def _result_from_row(self, row):
+        return LazyMigrationResult(
+            ts=parse_datetime(row['ts']),
+            num=row['num'],
+            name=row['name'],
+            short=row['short'],
+            md5=row['md5'],
+            result=bool(row['result']),
+            load=functools.partial(self._load_source, row['id'], row['md5']),
+            **{f: row[f] for f in EXTRA_FIELDS}
+        )
+
+    def _load_source(self, _id, md5):
+        rows = self._query("SELECT long, source FROM results WHERE id = ?", _id)
+
+        if rows and rows[0]['source'] is not None:
+            return {'long': rows[0]['long'], 'source': rows[0]['source']}
+
+        rows = self._query("SELECT data FROM sources WHERE md5 = ?", md5)
+
+        if rows:
+            return unpack(bytes(rows[0]['data']))
@@ -0,0 +1,142 @@
+import math
+from array import array
+from datetime import datetime, timedelta
+
+from .base import LazyMigrationResult
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class ResultsTable:
+    """ Compact list of results stored by columns.
+
+    Light fields are kept in arrays and lists of shared strings, so memory
+    depends on the number of results, not on the size of their sources.
+    `long` and `source` are loaded on access by `load(offset, md5)`, where
+    offset is the position of the result in file (-1 if unknown).
+    Items are LazyMigrationResult objects made on every access.
+
+    :load: callable, must return dict with `long` and `source` keys
+        or None
+    """
+    def __init__(self, load):
+        self._load = load
+        self._strings = {}
+        self.ts = array('q')
+        self.num = array('q')
+        self.name = []
+        self.short = []
+        self.md5 = []
+        self.result = bytearray()
+        self.duration = array('d')
+        self.cpu = array('d')
+        self.memory = array('q')
+        self.offsets = array('q')
+        self._profiles = {}
+        self._heavy = {}
+        self._aware_ts = {}
+
+    def append(self, result, offset=-1):
+        """ Add result (MigrationResult or LazyMigrationResult).
+
+        :offset: position of result in file; if it is not known,
+            `long` and `source` are kept in memory
+        """
+        n = len(self.num)
+
+        if result.ts.tzinfo is None:
+            self.ts.append((result.ts - EPOCH) // MICROSECOND)
+        else:
+            self.ts.append(0)
+            self._aware_ts[n] = result.ts
+
+        self.num.append(result.num)
+        self.name.append(self._intern(result.name))
+        self.short.append(self._intern(result.short))
+        self.md5.append(self._intern(result.md5))
+        self.result.append(bool(result.result))
+        self.duration.append(_float(result.duration))
+        self.cpu.append(_float(result.cpu))
+        self.memory.append(-1 if result.memory is None else result.memory)
+        self.offsets.append(offset)
+
+        if result.profile is not None:
+            self._profiles[n] = result.profile
+
+        if (offset < 0 and result.source is not None and
+                not isinstance(result, LazyMigrationResult)):
+            self._heavy[n] = {'long': result.long, 'source': result.source}
+
+    def set_offset(self, n, offset, heavy=None):
+        """ Set position of result in file after the file is rewritten.
+
+        :heavy: dict with `long` and `source` to keep in memory
+            (when offset is -1)
+        """
+        self.offsets[n] = offset
+
+        if heavy is None:
+            self._heavy.pop(n, None)
+        else:
+            self._heavy[n] = heavy
+
+    def last_indexes(self):
+        """ Return dict {(num, name): index of last result}.
+        """
+        return {key: n for n, key in enumerate(zip(self.num, self.name))}
+
+    def indexes(self, num, name):
+        return [n for n, key in enumerate(zip(self.num, self.name))
+                if key == (num, name)]
+
+    def __len__(self):
+        return len(self.num)
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self._get(n)
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self._get(i) for i in range(*n.indices(len(self)))]
+
+        if n < 0:
+            n += len(self)
+
+        if not 0 <= n < len(self):
+            raise IndexError(n)
+
+        return self._get(n)
+
+    def _get(self, n):
+        duration, cpu, memory = self.duration[n], self.cpu[n], self.memory[n]
+
+        return LazyMigrationResult(
+            ts=self._aware_ts.get(n) or EPOCH + self.ts[n] * MICROSECOND,
+            num=self.num[n],
+            name=self.name[n],
+            short=self.short[n],
+            md5=self.md5[n],
+            result=bool(self.result[n]),
+            load=lambda: self._load_heavy(n),
+            duration=None if math.isnan(duration) else duration,
+            cpu=None if math.isnan(cpu) else cpu,
+            memory=None if memory < 0 else memory,
+            profile=self._profiles.get(n),
+        )
+
+    def _load_heavy(self, n):
+        if n in self._heavy:
+            return self._heavy[n]
+        else:
+            return self._load(self.offsets[n], self.md5[n])
+
+    def _intern(self, value):
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+
+
+def _float(value):
+    return math.nan if value is None else float(value)
@@ -0,0 +1,57 @@
+class MigraniteError(Exception):
+    """ Base of migranite errors.
+    """
+
+
+class SettingsError(MigraniteError):
+    """ Settings are missing or wrong.
+    """
+
+
+class MigrationNotFound(MigraniteError):
+    """ Migration is not found or name matches several migrations.
+    """
+
+
+class DependencyError(MigraniteError):
+    """ Wrong `depends_on` of migration.
+    """
+
+
+class LockTimeout(MigraniteError):
+    """ Lock was not acquired in time.
+    """
+
+
+class LockLost(MigraniteError):
+    """ Lock expired or was taken by other process while migrations run.
+    """
+
+
+class MigrationFailed(MigraniteError):
+    """ Migrations failed while running.
+
+    :result: migranite.api.RunResult
+    """
+    def __init__(self, result):
+        self.result = result
+        names = []
+
+        for report in result.failed:
+            if report.target is not None:
+                names.append(report.target.name)
+            elif report.error is not None:
+                names.append(str(report.error))
+            else:
+                names.extend(_run_name(r) for r in report.failed)
+
+        super().__init__("Migrations failed: {}".format(', '.join(names)))
+
+
+def _run_name(run):
+    name = '{0.num}-{0.name}'.format(run.migration)
+
+    if run.error is not None:
+        name += ' ({}: {})'.format(type(run.error).__name__, run.error)
+
+    return name
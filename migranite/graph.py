@@ -0,0 +1,75 @@
+import concurrent.futures
+
+
+def run_graph(items, dependencies, func, jobs, on_skip=None):
+    """ Run `func` for items in thread pool respecting dependencies.
+
+    :items: list of items
+    :dependencies: list of sets with indexes of items which must be
+        successfully finished before item with the same index
+    :func: callable(item), return True on success
+    :jobs: number of threads
+    :on_skip: callable(item), called for items skipped because of
+        failed dependencies
+
+    Return list of results: True, False or None for skipped items,
+    and list of exceptions raised by `func` (None if not raised).
+    """
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    remaining = [len(deps) for deps in dependencies]
+    dependents = [[] for _ in items]
+
+    for i, deps in enumerate(dependencies):
+        for d in deps:
+            dependents[d].append(i)
+
+    skipped = [False] * len(items)
+
+    def skip(i):
+        stack = [i]
+
+        while stack:
+            i = stack.pop()
+
+            if not skipped[i]:
+                skipped[i] = True
+                if on_skip is not None:
+                    on_skip(items[i])
+                stack.extend(reversed(dependents[i]))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = {}
+
+        def submit(i):
+            running[executor.submit(func, items[i])] = i
+
+        for i, count in enumerate(remaining):
+            if count == 0:
+                submit(i)
+
+        while running:
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in sorted(finished, key=running.get):
+                i = running.pop(future)
+
+                try:
+                    results[i] = bool(future.result())
+                except Exception as exc:
+                    results[i] = False
+                    errors[i] = exc
+
+                for j in dependents[i]:
+                    if skipped[j]:
+                        continue
+                    elif not results[i]:
+                        skip(j)
+                        continue
+
+                    remaining[j] -= 1
+                    if remaining[j] == 0:
+                        submit(j)
+
+    return results, errors
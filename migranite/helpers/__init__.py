@@ -0,0 +1,6 @@
+""" Helpers for writing migrations.
+
+Modules import their database drivers, import only needed ones:
+
+    from migranite.helpers import mongo
+"""
@@ -0,0 +1,224 @@
+""" Batched writes for MongoDB migrations.
+
+Instead of `update_one` for every document:
+
+    from pymongo import UpdateOne
+    from migranite.helpers import mongo
+
+    def run():
+        def fix(doc):
+            return UpdateOne({'_id': doc['_id']},
+                             {'$set': {'email': doc['email'].lower()}})
+
+        counters = mongo.update_each(users, fix, {'email': {'$exists': True}},
+                                     projection={'email': 1}, workers=4)
+        print(counters)
+"""
+import threading
+
+import pymongo
+import pymongo.errors
+
+
+class Counters:
+    """ Thread-safe progress counters of bulk writes.
+    """
+    FIELDS = ('docs', 'ops', 'batches',
+              'inserted', 'matched', 'modified', 'deleted', 'upserted')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, **values):
+        with self._lock:
+            for field, value in values.items():
+                setattr(self, field, getattr(self, field) + value)
+
+    def add_result(self, result):
+        """ Add counts from BulkWriteResult or details of BulkWriteError.
+        """
+        if isinstance(result, dict):
+            self.add(inserted=result.get('nInserted', 0),
+                     matched=result.get('nMatched', 0),
+                     modified=result.get('nModified', 0),
+                     deleted=result.get('nRemoved', 0),
+                     upserted=result.get('nUpserted', 0))
+        else:
+            self.add(inserted=result.inserted_count,
+                     matched=result.matched_count,
+                     modified=result.modified_count,
+                     deleted=result.deleted_count,
+                     upserted=result.upserted_count)
+
+    def as_dict(self):
+        with self._lock:
+            return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return "<Counters {}>".format(' '.join(
+            '{}={}'.format(k, v) for k, v in self.as_dict().items()))
+
+
+class BulkWriter:
+    """ Collect write operations and send them by `bulk_write` batches.
+
+    :collection: pymongo collection
+    :batch_size: number of operations in one `bulk_write` (default 1000)
+    :ordered: ordered writes (default False, the server may apply
+        operations of batch in parallel)
+    :counters: Counters object, shared by writers of parallel workers
+    :progress: callable, called with counters after every batch
+    """
+    def __init__(self, collection, batch_size=1000, ordered=False,
+                 counters=None, progress=None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.counters = counters if counters is not None else Counters()
+        self.progress = progress
+        self._ops = []
+
+    def add(self, op):
+        """ Add write operation (pymongo.UpdateOne, InsertOne and others).
+        """
+        self._ops.append(op)
+
+        if len(self._ops) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """ Write collected operations.
+        """
+        ops, self._ops = self._ops, []
+
+        if not ops:
+            return
+
+        try:
+            result = self.collection.bulk_write(ops, ordered=self.ordered)
+        except pymongo.errors.BulkWriteError as exc:
+            self.counters.add_result(exc.details)
+            raise
+
+        self.counters.add_result(result)
+        self.counters.add(ops=len(ops), batches=1)
+
+        if self.progress is not None:
+            self.progress(self.counters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+def split_id_ranges(collection, parts, query=None, samples=100):
+    """ Split documents into `parts` ranges of `_id` with about equal size.
+
+    Bounds are quantiles of `_id` of random sample of `parts * samples`
+    documents (`$sample`), so the collection is not scanned for every
+    bound. Values of `_id` must be of one type.
+
+    Return list of (lower, upper) bounds, lower is inclusive, upper is
+    exclusive, None is unbounded. Use `range_query` to get query of range.
+    """
+    if parts <= 1:
+        return [(None, None)]
+
+    pipeline = [{'$sample': {'size': parts * samples}}, {'$project': {'_id': 1}}]
+    if query:
+        pipeline.insert(0, {'$match': query})
+
+    ids = sorted(doc['_id'] for doc in collection.aggregate(pipeline))
+    bounds = []
+
+    for n in range(1, parts if ids else 1):
+        bound = ids[n * len(ids) // parts]
+        if not bounds or bound != bounds[-1]:
+            bounds.append(bound)
+
+    lowers = [None] + bounds
+    uppers = bounds + [None]
+    return list(zip(lowers, uppers))
+
+
+def range_query(query, lower=None, upper=None):
+    """ Add `_id` range to query.
+    """
+    query = dict(query or {})
+    condition = {}
+
+    if lower is not None:
+        condition['$gte'] = lower
+    if upper is not None:
+        condition['$lt'] = upper
+
+    if condition:
+        if '_id' in query:
+            query = {'$and': [query, {'_id': condition}]}
+        else:
+            query['_id'] = condition
+
+    return query
+
+
+def update_each(collection, func, query=None, projection=None,
+                batch_size=1000, ordered=False, workers=1, progress=None,
+                target=None):
+    """ Call `func` for every document and write returned operations.
+
+    Documents are read with cursor batches of `batch_size` and written
+    with `bulk_write` batches. With `workers` > 1 documents are split
+    into `_id` ranges, which are processed in threads.
+
+    :collection: pymongo collection to read
+    :func: callable, gets document and returns write operation,
+        list of operations or None
+    :query: filter of documents
+    :projection: fields of documents to read
+    :batch_size: number of documents in batches (default 1000)
+    :ordered: ordered writes (default False)
+    :workers: number of parallel workers (default 1)
+    :progress: callable, called with Counters after every written batch
+    :target: collection to write (default `collection`)
+
+    Return Counters.
+    """
+    counters = Counters()
+    target = target if target is not None else collection
+
+    def worker(lower, upper):
+        cursor = collection.find(range_query(query, lower, upper), projection,
+                                 batch_size=batch_size)
+
+        with BulkWriter(target, batch_size, ordered, counters, progress) as writer:
+            for doc in cursor:
+                counters.add(docs=1)
+                ops = func(doc)
+
+                if ops is None:
+                    continue
+                elif isinstance(ops, (list, tuple)):
+                    for op in ops:
+                        writer.add(op)
+                else:
+                    writer.add(ops)
+
+    if workers <= 1:
+        worker(None, None)
+        return counters
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    ranges = split_id_ranges(collection, workers, query)
+
+    with ThreadPoolExecutor(workers) as executor:
+        for future in [executor.submit(worker, *r) for r in ranges]:
+            future.result()
+
+    return counters
@@ -4,6 +4,7 @@ SETTINGS = Template("""\
 [migrations]
 path = "$migranite_path"
 ; digits = 3
+; cache = ".migranite_cache"
 
 [templates]
 path = "$templates_path"
@@ -12,6 +13,11 @@ default = "default.py"
 [database]
 backend = "json"
 path = ".migranite_db.json"
+; journal = false
+
+; [database]
+; backend = "sqlite"
+; path = ".migranite_db.sqlite"
 
 ; [database]
 ; backend = "mongo"
@@ -0,0 +1,87 @@
+import os
+import socket
+import time
+import uuid
+
+from .exceptions import LockTimeout
+from .log import logger
+
+
+def get_owner():
+    """ Name of lock owner: host, process and random suffix.
+    """
+    return '{}:{}:{}'.format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class FileLock:
+    """ Exclusive lock of file, works for processes on one host.
+
+    Waiting process sleeps in `flock` until the lock is released.
+
+    :path: path of lock file
+    :timeout: seconds to wait, None to wait forever
+    """
+    poll = 0.5
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+
+    def acquire(self):
+        import fcntl
+
+        f = open(self.path, 'a+')
+
+        try:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.seek(0)
+                logger.info("Waiting for lock %s held by %s",
+                            self.path, f.read().strip() or 'unknown')
+                self._wait(f)
+        except BaseException:
+            f.close()
+            raise
+
+        f.seek(0)
+        f.truncate()
+        f.write(get_owner())
+        f.flush()
+        self._file = f
+
+    def release(self):
+        import fcntl
+
+        if self._file is not None:
+            self._file.truncate(0)
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    def _wait(self, f):
+        import fcntl
+
+        if self.timeout is None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            return
+
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise LockTimeout("Lock {} is not acquired in {} seconds"
+                                      "".format(self.path, self.timeout))
+                time.sleep(self.poll)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
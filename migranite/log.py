@@ -0,0 +1,20 @@
+""" Logger of migranite.
+
+Library code logs progress and warnings to `migranite` logger and prints
+nothing by itself. The command line tool shows messages on stderr.
+"""
+import logging
+
+logger = logging.getLogger('migranite')
+logger.addHandler(logging.NullHandler())
+
+
+def to_stderr():
+    """ Show messages of migranite logger on stderr.
+    """
+    import sys
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
@@ -0,0 +1,102 @@
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+class Measure:
+    """ Measure wall time, CPU time and memory growth of code block.
+
+    CPU time is process time, so with parallel migrations it includes
+    time of other migrations running at the same moment. Memory is growth
+    of resident set size in bytes: peak while the block runs minus size
+    at its start. On Linux the peak is reset at the start of the block,
+    elsewhere it is growth of the peak of the process, so a block which
+    stays below an earlier peak has zero growth.
+    """
+    duration = None
+    cpu = None
+    memory = None
+
+    def __enter__(self):
+        if reset_peak_rss():
+            self._start_memory = current_rss()
+            self._peak = peak_rss
+        else:
+            self._start_memory = peak_memory()
+            self._peak = peak_memory
+
+        self._start = time.perf_counter()
+        self._start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        self.cpu = time.process_time() - self._start_cpu
+        peak = self._peak()
+
+        if peak is not None and self._start_memory is not None:
+            self.memory = max(peak - self._start_memory, 0)
+
+    def as_dict(self):
+        return {
+            'duration': self.duration,
+            'cpu': self.cpu,
+            'memory': self.memory,
+        }
+
+
+def peak_memory():
+    """ Peak resident set size of the process in bytes or None.
+    """
+    if resource is None:
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == 'darwin':
+        return maxrss
+    else:
+        return maxrss * 1024
+
+
+def reset_peak_rss():
+    """ Reset peak resident set size of the process (Linux only).
+
+    Return True if it was reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    else:
+        return True
+
+
+def current_rss():
+    """ Resident set size of the process in bytes (Linux only) or None.
+    """
+    return _proc_status('VmRSS')
+
+
+def peak_rss():
+    """ Peak resident set size since the last `reset_peak_rss`
+    (Linux only) or None.
+    """
+    return _proc_status('VmHWM')
+
+
+def _proc_status(key):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(key + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return None
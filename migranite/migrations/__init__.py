@@ -1,57 +1,147 @@
 import os
 
 from .base import MigrationInterface  # noqa
+from .cache import MetadataCache
+from .data import MigrationCSV, MigrationJSONL
 from .py import MigrationPy
+from ..exceptions import SettingsError
+
+# file extension -> migration class
+TYPES = {
+    '.py': MigrationPy,
+    '.jsonl': MigrationJSONL,
+    '.csv': MigrationCSV,
+}
 
 
 def get_all(settings):
     """ Get all available migtarion.
     """
-    return [get(settings, fn) for fn in get_files(settings)]
+    cache = MetadataCache.from_settings(settings)
+    result = [get(settings, entry.name, cache, entry.stat())
+              for entry in _scan(settings)]
+
+    if cache is not None:
+        cache.save()
+
+    return result
+
+
+def get_index(settings):
+    """ Get all available migrations indexed by number and name.
+    """
+    return Index(get_all(settings))
 
 
 def get_files(settings):
+    for entry in _scan(settings):
+        yield entry.name
+
+
+def get_max_num(settings):
+    """ Get maximum number of migrations without loading them.
+    """
+    nums = (file_name.split('-', 1)[0] for file_name in get_files(settings))
+    return max([int(num) for num in nums if num.isdigit()] + [0])
+
+
+def _scan(settings):
     path = settings['migrations']['path']
     if not os.path.isdir(path):
-        print("{} not exists".format(path))
-        return []
+        raise SettingsError("Migrations directory {} not exists".format(path))
 
-    for file_name in sorted(os.listdir(path)):
-        if file_name.startswith('.'):
-            continue
-        elif not os.path.splitext(file_name)[1]:
-            continue
+    entries = []
+
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            elif not os.path.splitext(entry.name)[1]:
+                continue
+            elif not entry.is_file():
+                continue
 
-        yield file_name
+            entries.append(entry)
 
+    entries.sort(key=lambda e: e.name)
+    return entries
 
-def get(settings, file_name):
+
+def get(settings, file_name, cache=None, stat=None):
     """ Get migration object for file.
+
+    :cache: MetadataCache object
+    :stat: result of os.stat for file, if it is known
     """
     name, ext = os.path.splitext(file_name)
 
-    if ext == '.py':
-        return MigrationPy(settings, file_name)
+    if ext in TYPES:
+        migration = TYPES[ext](settings, file_name)
     else:
         raise ValueError("Unknown migration type {!r}".format(file_name))
 
+    if cache is not None:
+        stat = stat or os.stat(migration.path)
+        metadata = cache.get(file_name, stat)
+
+        if metadata is not None:
+            migration.metadata = metadata
+        else:
+            cache.set(file_name, stat, migration.metadata)
+
+    return migration
+
 
 def find(migrations, num=None, name=None):
     """ Find migtations for num and name.
+
+    :migrations: Index or list of migrations
     """
+    if isinstance(migrations, Index):
+        return migrations.find(num, name)
+
     result = []
 
     for migration in migrations:
+        if num is not None and migration.num != num:
+            continue
+        elif name is not None and migration.name != name:
+            continue
+
+        result.append(migration)
+
+    return result
+
+
+class Index:
+    """ Migrations indexed by number and name.
+    """
+    def __init__(self, migrations):
+        self.migrations = list(migrations)
+        self.by_num = {}
+        self.by_name = {}
+        self.by_key = {}
+
+        for migration in self.migrations:
+            self.by_num.setdefault(migration.num, []).append(migration)
+            self.by_name.setdefault(migration.name, []).append(migration)
+            self.by_key[(migration.num, migration.name)] = migration
+
+    def __iter__(self):
+        return iter(self.migrations)
+
+    def __len__(self):
+        return len(self.migrations)
+
+    def find(self, num=None, name=None):
+        """ Find migtations for num and name.
+        """
         if num is not None and name is not None:
-            if migration.num == num and migration.name == name:
-                result.append(migration)
+            migration = self.by_key.get((num, name))
+            return [migration] if migration is not None else []
         elif num is not None:
-            if migration.num == num:
-                result.append(migration)
+            return list(self.by_num.get(num, []))
         elif name is not None:
-            if migration.name == name:
-                result.append(migration)
+            return list(self.by_name.get(name, []))
         else:
-            result.extend(migrations)
-
-    return result
+            return list(self.migrations)
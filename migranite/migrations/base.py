@@ -53,9 +53,18 @@ class MigrationInterface(metaclass=abc.ABCMeta):
         """ Multiline long description.
         """
 
+    @abc.abstractproperty
+    def depends_on(self):
+        """ List of migrations names which must be applied before this one.
+
+        None if dependencies are not declared.
+        """
+
     @abc.abstractmethod
-    def run(self):
+    def run(self, context=None):
         """ Migration logic.
+
+        :context: migranite.context.Context object
         """
 
     @abc.abstractmethod
@@ -69,6 +78,8 @@ class MigrationInterface(metaclass=abc.ABCMeta):
 
 class MigrationBase(MigrationInterface):
     _source = None
+    _md5 = None
+    _depends_on = None
 
     def __init__(self, settings, file_name, verbose=False):
         self._settings = settings
@@ -103,14 +114,53 @@ class MigrationBase(MigrationInterface):
     @property
     def source(self):
         if self._source is None:
-            f = open(os.path.join(self.settings['migrations']['path'], self.file_name), 'r')
+            f = open(self.path, 'r')
             with f:
                 self._source = f.read()
         return self._source
 
     @property
     def md5(self):
-        return hashlib.md5(self.source.encode('utf8')).hexdigest()
+        if self._md5 is None:
+            if self._source is None:
+                self._md5 = file_md5(self.path)
+            else:
+                self._md5 = hashlib.md5(self.source.encode('utf8')).hexdigest()
+        return self._md5
+
+    @property
+    def depends_on(self):
+        return self._depends_on
+
+    @property
+    def is_async(self):
+        """ True if migration runs on the shared event loop.
+        """
+        return False
+
+    @property
+    def path(self):
+        return os.path.join(self.settings['migrations']['path'], self.file_name)
+
+    @property
+    def metadata(self):
+        """ Metadata dict for caching.
+        """
+        return {
+            'num': self.num,
+            'name': self.name,
+            'short': self.short,
+            'long': self.long,
+            'md5': self.md5,
+            'depends_on': self.depends_on,
+        }
+
+    @metadata.setter
+    def metadata(self, metadata):
+        self._short = metadata['short']
+        self._long = metadata['long']
+        self._md5 = metadata['md5']
+        self._depends_on = metadata['depends_on']
 
     def __lt__(self, other):
         if self.num == other.num:
@@ -126,3 +176,26 @@ class MigrationBase(MigrationInterface):
 
     def __str__(self):
         return "{m.num}-{m.name}: {m.short}".format(m=self)
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def file_md5(path):
+    """ Md5 of migration source, read from file by chunks.
+
+    Equal to md5 of the decoded source. Files with carriage returns
+    are hashed through the text mode to get the same newlines.
+    """
+    md5 = hashlib.md5()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            if b'\r' in chunk:
+                break
+            md5.update(chunk)
+        else:
+            return md5.hexdigest()
+
+    with open(path, 'r') as f:
+        return hashlib.md5(f.read().encode('utf8')).hexdigest()
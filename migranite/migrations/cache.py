@@ -0,0 +1,171 @@
+import json
+import marshal
+import os
+import sys
+
+from ..utils import atomic_write
+
+
+def get_cache_dir(settings):
+    """ Path to cache directory or None if cache is disabled.
+    """
+    path = settings['migrations'].get('cache')
+
+    if path is False:
+        return None
+    elif path:
+        return path
+    elif settings.get('file'):
+        return os.path.join(os.path.dirname(settings['file']), '.migranite_cache')
+    else:
+        return None
+
+
+class MetadataCache:
+    """ On-disk cache of migrations metadata.
+
+    Entries are keyed by file name and valid while mtime and size
+    of the file are not changed.
+    """
+    version = 2
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = None
+        self._seen = set()
+        self._changed = False
+
+    @classmethod
+    def from_settings(cls, settings):
+        cache_dir = get_cache_dir(settings)
+        if cache_dir is not None:
+            return cls(os.path.join(cache_dir, 'metadata.json'))
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf8') as f:
+                    raw = json.load(f)
+            except (OSError, ValueError):
+                raw = {}
+
+            if raw.get('version') == self.version:
+                self._entries = raw['files']
+            else:
+                self._entries = {}
+
+        return self._entries
+
+    def get(self, file_name, stat):
+        """ Return cached metadata dict or None.
+        """
+        self._seen.add(file_name)
+        entry = self.entries.get(file_name)
+
+        if (entry is not None and
+                entry['mtime'] == stat.st_mtime_ns and
+                entry['size'] == stat.st_size):
+            return entry['metadata']
+
+    def set(self, file_name, stat, metadata):
+        self._seen.add(file_name)
+        self.entries[file_name] = {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'metadata': metadata,
+        }
+        self._changed = True
+
+    def save(self, prune=True):
+        """ Write cache if it was changed.
+
+        :prune: remove entries for files not seen from loading
+        """
+        if prune:
+            for file_name in set(self.entries) - self._seen:
+                del self.entries[file_name]
+                self._changed = True
+
+        if not self._changed:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with atomic_write(self.path, 'w', encoding='utf8') as f:
+                json.dump({'version': self.version, 'files': self.entries}, f)
+        except OSError:
+            return
+
+        self._changed = False
+
+
+class BytecodeCache:
+    """ On-disk cache of compiled migrations modules.
+
+    Code objects are stored with marshal, like `.pyc` files, and keyed
+    by md5 of source and python implementation, so changed sources
+    and other pythons never get stale code.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def from_settings(cls, settings):
+        cache_dir = get_cache_dir(settings)
+        if cache_dir is not None:
+            return cls(os.path.join(cache_dir, 'bytecode'))
+
+    def get(self, md5, file_path):
+        """ Return code object or None.
+
+        :file_path: path to source, used in tracebacks
+        """
+        try:
+            with open(self._get_path(md5), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        magic = _get_magic()
+
+        if not data.startswith(magic):
+            return None
+
+        try:
+            code = marshal.loads(data[len(magic):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+        _fix_co_filename(code, file_path)
+        return code
+
+    def set(self, md5, code):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with atomic_write(self._get_path(md5), 'wb') as f:
+                f.write(_get_magic())
+                marshal.dump(code, f)
+        except (OSError, ValueError):
+            return
+
+    def _get_path(self, md5):
+        tag = sys.implementation.cache_tag or 'unknown'
+        if sys.flags.optimize:
+            tag += '.opt-{}'.format(sys.flags.optimize)
+        return os.path.join(self.path, '{}.{}.bin'.format(md5, tag))
+
+
+def _get_magic():
+    import importlib.util
+    return importlib.util.MAGIC_NUMBER
+
+
+def _fix_co_filename(code, file_path):
+    # the same as the import system does for .pyc files of moved sources
+    import _imp
+
+    fix = getattr(_imp, '_fix_co_filename', None)
+
+    if fix is not None:
+        fix(code, file_path)
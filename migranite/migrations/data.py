@@ -0,0 +1,207 @@
+import abc
+import functools
+import hashlib
+import importlib
+import itertools
+import json
+
+from .base import MigrationBase, file_md5
+
+_NOT_READ = object()
+
+
+class MigrationData(MigrationBase):
+    """ Base of data migrations, which load records from file.
+
+    Records are read from disk and passed to the target by chunks,
+    so memory use does not depend on the size of file. Progress is
+    saved as checkpoint after every chunk.
+
+    Metadata is read from the header of file:
+
+    :short: one-line description
+    :long: long description
+    :version: version of data; if set, md5 is made from the header only,
+        otherwise from the whole file
+    :collection: name of MongoDB collection in the migrations database
+        to write records to; records with `_id` are upserted, so a chunk
+        sent again after a crash does not fail
+    :callback: 'module:callable' to call with list of records and context
+        instead of `collection`
+    :chunk_size: number of records in one chunk (default 1000)
+    :depends_on: list of migrations names
+    """
+    chunk_size = 1000
+
+    _header = None
+    _short = None
+    _long = None
+    _depends_on = _NOT_READ
+
+    @abc.abstractmethod
+    def _read_header(self):
+        """ Return (header dict, header source).
+        """
+
+    @abc.abstractmethod
+    def records(self):
+        """ Iterate over records of file.
+        """
+
+    @property
+    def header(self):
+        if self._header is None:
+            self._header, self._source = self._read_header()
+        return self._header
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._header, self._source = self._read_header()
+        return self._source
+
+    @property
+    def md5(self):
+        if self._md5 is None:
+            if self.header.get('version') is not None:
+                self._md5 = hashlib.md5(self.source.encode('utf8')).hexdigest()
+            else:
+                self._md5 = file_md5(self.path)
+        return self._md5
+
+    @property
+    def short(self):
+        if self._short is None:
+            self._short = self.header.get('short', '')
+        return self._short
+
+    @property
+    def long(self):
+        if self._long is None:
+            self._long = self.header.get('long', '')
+        return self._long
+
+    @property
+    def depends_on(self):
+        if self._depends_on is _NOT_READ:
+            self._depends_on = self.header.get('depends_on')
+        return self._depends_on
+
+    def run(self, context=None):
+        send = self._get_target(context)
+        chunk_size = int(self.header.get('chunk_size', self.chunk_size))
+        done = (context.checkpoint if context is not None else None) or 0
+        chunk = []
+
+        for n, record in enumerate(self.records(), 1):
+            if n <= done:
+                continue
+
+            chunk.append(record)
+
+            if len(chunk) >= chunk_size:
+                send(chunk)
+                chunk = []
+                if context is not None:
+                    context.save_checkpoint(n)
+
+        if chunk:
+            send(chunk)
+
+    def _get_target(self, context):
+        if self.header.get('callback'):
+            module_name, name = self.header['callback'].split(':', 1)
+            func = getattr(importlib.import_module(module_name), name)
+            return lambda records: func(records, context)
+
+        elif self.header.get('collection'):
+            db = getattr(context, 'db', None)
+
+            if not hasattr(db, 'collection'):
+                raise RuntimeError("Migration {} needs mongo database for "
+                                   "collection".format(self.file_name))
+
+            collection = db.collection.database[self.header['collection']]
+            return functools.partial(_write_records, collection)
+
+        else:
+            raise RuntimeError("Migration {} has no collection or callback"
+                               "".format(self.file_name))
+
+
+def _write_records(collection, records):
+    """ Write chunk of records to collection.
+
+    Records with `_id` replace existing documents: the chunk may be
+    partially written before a crash and sent again from checkpoint.
+    """
+    from pymongo import InsertOne, ReplaceOne
+
+    requests = [ReplaceOne({'_id': r['_id']}, r, upsert=True) if '_id' in r
+                else InsertOne(r) for r in records]
+    collection.bulk_write(requests, ordered=False)
+
+
+class MigrationJSONL(MigrationData):
+    """ Data migration from file with one JSON record per line.
+
+    The first line may be the header: `{"migranite": {"short": ...}}`.
+    """
+    def _read_header(self):
+        with open(self.path, 'r', encoding='utf8') as f:
+            line = f.readline()
+
+        try:
+            raw = json.loads(line)
+        except ValueError:
+            raw = None
+
+        if isinstance(raw, dict) and isinstance(raw.get('migranite'), dict):
+            return raw['migranite'], line
+        else:
+            return {}, ''
+
+    def records(self):
+        with open(self.path, 'r', encoding='utf8') as f:
+            if self.source:
+                f.readline()
+
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class MigrationCSV(MigrationData):
+    """ Data migration from CSV file with column names in the first row.
+
+    The header is comment lines before the data: `# short: ...`.
+    `long` may take several lines, `depends_on` is comma-separated.
+    """
+    def _read_header(self):
+        header = {}
+        lines = []
+
+        with open(self.path, 'r', encoding='utf8', newline='') as f:
+            for line in f:
+                if not line.startswith('#'):
+                    break
+
+                lines.append(line)
+                key, _, value = line[1:].partition(':')
+                key, value = key.strip(), value.strip()
+
+                if key == 'long' and 'long' in header:
+                    header['long'] += '\n' + value
+                elif key == 'depends_on':
+                    header[key] = [v.strip() for v in value.split(',') if v.strip()]
+                elif key:
+                    header[key] = value
+
+        return header, ''.join(lines)
+
+    def records(self):
+        import csv
+
+        with open(self.path, 'r', encoding='utf8', newline='') as f:
+            lines = itertools.dropwhile(lambda line: line.startswith('#'), f)
+            yield from csv.DictReader(lines)
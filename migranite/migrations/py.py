@@ -1,6 +1,15 @@
+import ast
+import functools
+import io
+import threading
+import tokenize
 import types
 
 from .base import MigrationBase
+from .cache import BytecodeCache
+
+_NOT_READ = object()
+_module_lock = threading.RLock()
 
 
 class MigrationPy(MigrationBase):
@@ -8,6 +17,7 @@ class MigrationPy(MigrationBase):
     _module = None
     _short = None
     _long = None
+    _depends_on = _NOT_READ
 
     @property
     def short(self):
@@ -21,23 +31,100 @@ class MigrationPy(MigrationBase):
             self._read_doc()
         return self._long
 
-    def run(self):
-        self.module.run()
+    @property
+    def depends_on(self):
+        if self._depends_on is _NOT_READ:
+            self._depends_on = read_depends_on(self.source)
+        return self._depends_on
+
+    @property
+    def is_async(self):
+        import inspect
+        return inspect.iscoroutinefunction(self.module.run)
+
+    def run(self, context=None):
+        import inspect
+
+        func = self.module.run
+
+        if inspect.signature(func).parameters:
+            func = functools.partial(func, context)
+
+        if self.is_async:
+            from .. import aio
+            aio.run(func())
+        else:
+            func()
 
     @property
     def module(self):
         if self._module is None:
-            self._read_module()
+            # module is shared by threads running it against several targets
+            with _module_lock:
+                if self._module is None:
+                    self._read_module()
         return self._module
 
     def _read_module(self):
-        self._module = types.ModuleType(self.file_name)
-        exec(self.source, self.module.__dict__)
+        module = types.ModuleType(self.file_name)
+        exec(self._compile(), module.__dict__)
+        self._module = module
+
+    def _compile(self):
+        cache = BytecodeCache.from_settings(self.settings)
+        code = cache.get(self.md5, self.path) if cache is not None else None
+
+        if code is None:
+            code = compile(self.source, self.path, 'exec')
+            if cache is not None:
+                cache.set(self.md5, code)
+
+        return code
 
     def _read_doc(self):
-        raw = self.module.__doc__.strip()
+        raw = (read_docstring(self.source) or '').strip()
         if '\n' in raw:
             t = tuple(s.strip() for s in raw.split('\n', 1))
             self._short, self._long = t
         else:
             self._short, self._long = raw, ''
+
+
+_SKIP_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE,
+                tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING}
+
+
+def read_docstring(source):
+    """ Read module docstring without executing the module.
+
+    Only tokens up to the first statement are read.
+    """
+    tokens = tokenize.generate_tokens(io.StringIO(source).readline)
+
+    try:
+        for token in tokens:
+            if token.type in _SKIP_TOKENS:
+                continue
+            elif token.type == tokenize.STRING:
+                return ast.literal_eval(token.string)
+            else:
+                return None
+    except (tokenize.TokenError, SyntaxError, ValueError):
+        return None
+
+
+def read_depends_on(source):
+    """ Read module level `depends_on` list without executing the module.
+    """
+    if 'depends_on' not in source:
+        return None
+
+    for node in ast.parse(source).body:
+        if not isinstance(node, ast.Assign):
+            continue
+
+        for target in node.targets:
+            if isinstance(target, ast.Name) and target.id == 'depends_on':
+                return list(ast.literal_eval(node.value))
+
+    return None
@@ -0,0 +1,129 @@
+import os
+import uuid
+from datetime import datetime
+
+MODES = ('cprofile', 'tracemalloc')
+
+
+def get_profiles_dir(settings):
+    """ Path to directory for profiles.
+    """
+    path = settings['migrations'].get('profiles')
+
+    if path:
+        return path
+    else:
+        return os.path.join(os.path.dirname(settings.get('file') or '.'),
+                            '.migranite_profiles')
+
+
+class Profiler:
+    """ Profile migrations and write one profile per run.
+
+    :mode: 'cprofile' or 'tracemalloc'
+    :path: directory for profiles
+    :top: number of entries in text summary
+
+    For every migration two files are written: profile data
+    (`.pstats` or `.tracemalloc`, load it with `pstats.Stats` or
+    `tracemalloc.Snapshot.load`) and text summary with `.txt` suffix.
+
+    cProfile sees only the thread running the migration, async migrations
+    run on the shared loop thread, so they are profiled by tracemalloc only.
+    """
+    def __init__(self, mode, path, top=30):
+        if mode not in MODES:
+            raise ValueError("Unknown profiler {!r}".format(mode))
+
+        self.mode = mode
+        self.path = path
+        self.top = top
+
+    def profile(self, migration, target=None):
+        """ Return context manager for profiling migration run.
+
+        Path of profile data file is available in `path` attribute
+        of the context manager after exit.
+
+        :target: migranite.targets.Target or None
+        """
+        name = '{}-{}'.format(migration.num, migration.name)
+
+        if target is not None:
+            name += '-' + target.name.replace(os.sep, '_')
+
+        # runs of the same migration may start in the same second
+        prefix = os.path.join(self.path, '{}-{:%Y%m%dT%H%M%S}-{}'.format(
+            name, datetime.now(), uuid.uuid4().hex[:8]))
+
+        if self.mode == 'cprofile':
+            return _CProfile(prefix, self.top)
+        else:
+            return _Tracemalloc(prefix, self.top)
+
+
+class _CProfile:
+    path = None
+
+    def __init__(self, prefix, top):
+        self.prefix = prefix
+        self.top = top
+
+    def __enter__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._profile.disable()
+
+        import pstats
+        os.makedirs(os.path.dirname(self.prefix), exist_ok=True)
+
+        self.path = self.prefix + '.pstats'
+        self._profile.dump_stats(self.path)
+
+        with open(self.prefix + '.txt', 'w') as f:
+            stats = pstats.Stats(self._profile, stream=f)
+            stats.sort_stats('cumulative').print_stats(self.top)
+
+
+class _Tracemalloc:
+    path = None
+
+    def __init__(self, prefix, top):
+        self.prefix = prefix
+        self.top = top
+
+    def __enter__(self):
+        import tracemalloc
+
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(25)
+
+        tracemalloc.clear_traces()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        import tracemalloc
+
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+
+        if self._started:
+            tracemalloc.stop()
+
+        os.makedirs(os.path.dirname(self.prefix), exist_ok=True)
+
+        self.path = self.prefix + '.tracemalloc'
+        snapshot.dump(self.path)
+
+        with open(self.prefix + '.txt', 'w') as f:
+            print("Peak traced memory: {} bytes\n".format(peak), file=f)
+            for stat in snapshot.statistics('lineno')[:self.top]:
+                print(stat, file=f)
@@ -4,7 +4,9 @@ import sys
 from colorama import Fore, Style
 
 from . import migrations
+from .api import Migranite, _lock
 from .db import get as get_db
+from .targets import get_targets, target_settings
 
 
 def init(settings, migrations, templates):
@@ -36,10 +38,18 @@ def init(settings, migrations, templates):
 def print_list(settings, long=False, all=False):
     """ Print list of available migrations.
 
+    With targets the list is printed for every target.
+
     :settings: settings dict
     """
-    db = get_db(settings)
+    objects = migrations.get_all(settings)
+
+    for name, db in _get_dbs(settings):
+        _print_target(name)
+        _print_list(db, objects, long, all)
 
+
+def _print_list(db, objects, long=False, all=False):
     def print_item(item, status, long=False):
         if status == 'PSS':
             color = Fore.GREEN
@@ -54,19 +64,25 @@ def print_list(settings, long=False, all=False):
         if long and item.long:
             print("\n{}\n".format(item.long))
 
+        if long and getattr(item, 'profile', None):
+            print("Profile: {}\n".format(item.profile))
+
     if all:
-        for result in db.results:
+        # long descriptions of all results are loaded at once
+        for result in db.full_results() if long else db.results:
             print_item(result, 'PSS' if result.result else 'ERR', long=long)
 
-    for item in migrations.get_files(settings):
-        item = migrations.get(settings, item)
+    last_results = db.last_results()
 
-        if db.success(item):
+    for item in objects:
+        last = last_results.get((item.num, item.name))
+
+        if last is None:
+            status = '   '
+        elif last.result:
             status = 'PSS'
-        elif db.find(item):
-            status = 'ERR'
         else:
-            status = '   '
+            status = 'ERR'
 
         if all and status.strip():
             continue
@@ -74,6 +90,113 @@ def print_list(settings, long=False, all=False):
         print_item(item, status, long=long)
 
 
+def verify(settings, jobs=None, as_json=False):
+    """ Compare migrations files with md5 of their last successful results.
+
+    Exit with code 1 if any applied migration was changed.
+
+    :settings: settings dict
+    :jobs: number of threads for hashing (default CPU count)
+    :as_json: print report as JSON
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # without metadata cache md5 is computed from the file
+    objects = [migrations.get(settings, fn) for fn in migrations.get_files(settings)]
+
+    with ThreadPoolExecutor(jobs or os.cpu_count()) as executor:
+        hashes = list(executor.map(lambda m: m.md5, objects))
+
+    reports = {}
+
+    for name, db in _get_dbs(settings):
+        reports[name] = _drift(db, objects, hashes)
+
+    changed = [i for r in reports.values() for i in r if i['status'] == 'changed']
+    failed = [i for r in reports.values() for i in r if i['status'] == 'failed']
+
+    if as_json:
+        import json
+        data = {'ok': not changed, 'checked': len(objects)}
+
+        if None in reports:
+            data['drift'] = reports[None]
+        else:
+            data['targets'] = {name: {'drift': report}
+                               for name, report in reports.items()}
+
+        print(json.dumps(data, indent=2))
+    else:
+        tags = {
+            'changed': ('CHG', Fore.RED),
+            'failed': ('ERR', Fore.YELLOW),
+            'missing': ('MIS', Fore.YELLOW),
+        }
+
+        for name, report in reports.items():
+            prefix = '' if name is None else name + '/'
+
+            for i in report:
+                tag, color = tags[i['status']]
+                print("[{C}{tag}{R}] {prefix}{num}-{name}: {status}, "
+                      "stored {stored_md5}, now {md5}".format(
+                          tag=tag, C=color, R=Style.RESET_ALL,
+                          prefix=prefix, **i))
+
+        targets = '' if None in reports else ' in {} targets'.format(len(reports))
+        print("{} checked{}, {} changed, {} failed".format(
+            len(objects), targets, len(changed), len(failed)))
+
+    if changed:
+        sys.exit(1)
+
+
+def _drift(db, objects, hashes):
+    """ List of changed, failed and missing migrations in database.
+    """
+    last_results = db.last_results()
+    report = []
+
+    def item(status, migration, md5, result):
+        return {
+            'status': status,
+            'num': migration.num,
+            'name': migration.name,
+            'file': migration.path,
+            'md5': md5,
+            'stored_md5': result.md5,
+            'applied': result.ts.isoformat(),
+            'result': result.result,
+        }
+
+    for migration, md5 in zip(objects, hashes):
+        last = last_results.pop((migration.num, migration.name), None)
+
+        if last is not None and not last.result:
+            # failed migration may be fixed before the next run,
+            # it is compared with the last successful run only
+            report.append(item('failed', migration, md5, last))
+            succeeded = [r for r in db.find(migration) if r.result]
+            last = succeeded[-1] if succeeded else None
+
+        if last is not None and last.md5 != md5:
+            report.append(item('changed', migration, md5, last))
+
+    for last in sorted(last_results.values(), key=lambda r: (r.num, r.name)):
+        report.append({
+            'status': 'missing',
+            'num': last.num,
+            'name': last.name,
+            'file': None,
+            'md5': None,
+            'stored_md5': last.md5,
+            'applied': last.ts.isoformat(),
+            'result': last.result,
+        })
+
+    return report
+
+
 def create(settings, template, name):
     """ Create new migration.
 
@@ -83,10 +206,10 @@ def create(settings, template, name):
     with open(template) as f:
         data = f.read()
 
-    digits = settings.get('digits', 3)
+    digits = settings['migrations'].get('digits', 3)
     _, ext = os.path.splitext(template)
 
-    num = max([m.num for m in migrations.get_all(settings)] + [0]) + 1
+    num = migrations.get_max_num(settings) + 1
 
     name = '{}-{}{}'.format(str(num).zfill(digits), name, ext)
 
@@ -96,75 +219,164 @@ def create(settings, template, name):
         f.write(data)
 
 
-def migrate(settings, migrations_names, force=False):
-    """ Run specified migrations.
+def print_stats(settings, limit=10):
+    """ Print the slowest migrations and duration trends.
+
+    With targets stats are printed for every target.
 
     :settings: settings dict
-    :migrations_names: list of migrations names
-    :force: run if migration already worked (default False)
+    :limit: number of migrations to show
     """
-    db = get_db(settings)
-    objects = migrations.get_all(settings)
-    found = []
+    for name, db in _get_dbs(settings):
+        _print_target(name)
+        _print_stats(db, limit)
 
-    for mn in migrations_names:
-        if '-' in mn and mn.split('-', 1)[0].isdigit():
-            num, name = mn.split('-', 1)
-            if num.isdigit():
-                num = int(num)
 
-        elif mn.isdigit():
-            num, name = int(mn), None
+def _print_stats(db, limit):
+    runs = {}
 
+    for result in db.results:
+        if result.duration is not None:
+            runs.setdefault((result.num, result.name), []).append(result)
+
+    items = sorted(runs.values(), key=lambda r: r[-1].duration, reverse=True)
+
+    print("{:>10} {:>10} {:>10} {:>6} {:>8}  migration".format(
+        "last", "cpu", "memory+", "runs", "trend"))
+
+    for results in items[:limit]:
+        last = results[-1]
+        previous = [r.duration for r in results[:-1]]
+
+        if previous and sum(previous):
+            average = sum(previous) / len(previous)
+            trend = "{:+.0%}".format(last.duration / average - 1)
         else:
-            num, name = None, mn
-
-        found_migrations = migrations.find(objects, num, name)
-
-        if not found_migrations:
-            print("Migration {!r} not found".format(mn),
-                  file=sys.stderr)
-            sys.exit(1)
-        elif len(found_migrations) > 1:
-            print("More than one migration found for {!r}".format(mn),
-                  file=sys.stderr)
-            sys.exit(1)
-        else:
-            migration = found_migrations[0]
-            if force or not db.success(migration):
-                found.append(migration)
-            else:
-                print("[{S}SKP{R}] {!s}".format(
-                    migration, S=Fore.YELLOW, R=Style.RESET_ALL))
+            trend = ''
+
+        print("{:>9.3f}s {:>9.3f}s {:>10} {:>6} {:>8}  {r.num}-{r.name}: {r.short}".format(
+            last.duration,
+            last.cpu or 0,
+            _format_size(last.memory),
+            len(results),
+            trend,
+            r=last,
+        ))
+
+
+def _format_size(size):
+    if size is None:
+        return ''
+
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024:
+            break
+        size /= 1024
+
+    return "{:.1f}{}".format(size, unit)
+
+
+def compact(settings):
+    """ Compact migrations database of every target.
+
+    The database is locked like for `run`, so results are not appended
+    while the file is rewritten.
+
+    :settings: settings dict
+    """
+    for name, db in _get_dbs(settings):
+        with _lock(settings, db):
+            db.compact()
+
 
-    for migration in sorted(found):
-        _run_migration(db, migration)
+def _get_dbs(settings):
+    """ Iterate over (target name, database) for every target
+    or (None, database) without targets.
+    """
+    targets = get_targets(settings)
+
+    if targets is None:
+        yield None, get_db(settings)
+        return
+
+    for target in targets:
+        yield target.name, get_db(target_settings(settings, target))
+
+
+def _print_target(name):
+    if name is not None:
+        print("{}:".format(name))
+
+
+def migrate(settings, migrations_names, force=False, jobs=1, async_limit=None,
+            profile=None, target_jobs=None):
+    """ Run specified migrations.
+
+    :settings: settings dict
+    :migrations_names: list of migrations names
+    :force: run if migration already worked (default False)
+    :jobs: number of migrations running in parallel (default 1)
+    :async_limit: number of async migrations running at once (default None)
+    :profile: profiler mode, 'cprofile' or 'tracemalloc' (default None)
+    :target_jobs: number of targets migrated in parallel (default from settings)
+    """
+    Migranite(settings, output=sys.stdout).run(
+        migrations_names, force, jobs, async_limit, profile, target_jobs)
 
 
-def migrate_all(settings):
+def migrate_all(settings, jobs=1, async_limit=None, profile=None, target_jobs=None):
     """ Run all migrations.
 
     :settings: settings dict
+    :jobs: number of migrations running in parallel (default 1)
+    :async_limit: number of async migrations running at once (default None)
+    :profile: profiler mode, 'cprofile' or 'tracemalloc' (default None)
+    :target_jobs: number of targets migrated in parallel (default from settings)
+    """
+    Migranite(settings, output=sys.stdout).run(
+        None, False, jobs, async_limit, profile, target_jobs)
+
+
+def print_plan(settings, migrations_names=None, force=False, as_json=False):
+    """ Print migrations which `run` would start, without running them.
+
+    :settings: settings dict
+    :migrations_names: list of migrations names (default all)
+    :force: as for `run --force`
+    :as_json: print plan as JSON
     """
-    db = get_db(settings)
-    for migration in migrations.get_all(settings):
-        if not db.success(migration):
-            _run_migration(db, migration)
+    plan = Migranite(settings).plan(migrations_names or None, force)
+
+    if isinstance(plan, dict):
+        if as_json:
+            import json
+            print(json.dumps({
+                'needed': any(p.needed for p in plan.values()),
+                'targets': {name: p.as_dict() for name, p in plan.items()},
+            }, indent=2))
         else:
-            print("[{S}SKP{R}] {!s}".format(
-                migration, S=Fore.YELLOW, R=Style.RESET_ALL))
-
-
-def _run_migration(db, migration):
-    print("[{S}RUN{R}] {!s}".format(
-        migration, S=Fore.GREEN, R=Style.RESET_ALL))
-
-    try:
-        result = False
-        migration.run()
-        result = True
-    finally:
-        db.add(migration, result)
-        if not result:
-            print("[{S}ERR{R}] {!s}".format(
-                migration, S=Fore.RED, R=Style.RESET_ALL))
+            for name, p in plan.items():
+                print("{}: {} to run, {} skipped".format(
+                    name, len(p.run), len(p.skipped)))
+
+        return
+
+    if as_json:
+        import json
+        print(json.dumps(plan.as_dict(), indent=2))
+        return
+
+    tags = {
+        'pending': ('RUN', Fore.GREEN),
+        'failed': ('RUN', Fore.RED),
+        'forced': ('RUN', Fore.YELLOW),
+        'skipped': ('SKP', Fore.YELLOW),
+    }
+
+    for migration in sorted(plan.run + plan.skipped):
+        state = plan.state(migration)
+        tag, color = tags[state]
+        print("[{C}{tag}{R}] {!s} ({})".format(
+            migration, state, tag=tag, C=color, R=Style.RESET_ALL))
+
+    print("{} to run, {} skipped".format(len(plan.run), len(plan.skipped)))
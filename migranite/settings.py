@@ -0,0 +1,58 @@
+import migranite.utils
+from .exceptions import SettingsError
+
+REQUIRED = [
+    ('migrations', 'path'),
+    ('templates', 'path'),
+    ('database', 'backend'),
+]
+
+
+def load(path):
+    """ Read settings file.
+
+    :path: path to settings file, may be relative from python package
+        ('package:file')
+
+    Raise FileNotFoundError if file not exists and SettingsError
+    if settings are wrong.
+    """
+    path = migranite.utils.parse_path(path)
+
+    with open(path, 'r', encoding='utf8') as f:
+        raw = f.read()
+
+    return parse(raw, path)
+
+
+def parse(raw, path=None):
+    """ Parse settings from string.
+
+    :path: path of settings file, stored with `file` key
+    """
+    import zini
+
+    settings_reader = zini.Zini()
+
+    settings_reader['migrations']['path'] = str
+    settings_reader['migrations']['digits'] = 3
+
+    settings_reader['templates']['path'] = str
+    settings_reader['templates']['default'] = "default.py"
+
+    settings_reader['database']['backend'] = str
+
+    try:
+        settings = settings_reader.parse(raw)
+    except zini.ParseError as exc:
+        raise SettingsError("Bad settings file {!r}: {}".format(path, exc)) from exc
+
+    settings['file'] = path
+
+    errors = ["Section {!r} must include the {!r} key.".format(section, key)
+              for section, key in REQUIRED if key not in settings[section]]
+
+    if errors:
+        raise SettingsError('\n'.join(errors))
+
+    return settings
@@ -0,0 +1,74 @@
+import importlib
+from collections import namedtuple
+
+from .exceptions import SettingsError
+
+Target = namedtuple('Target', ('name', 'database'))
+Target.__doc__ = """ Database which migrations run against.
+
+:name: target name
+:database: `[database]` settings of the target
+"""
+
+PLACEHOLDER = '{target}'
+
+
+def get_targets(settings):
+    """ List of targets (Target) from `[database]` settings or None.
+
+    `targets` is a list or 'module:callable' string. The callable gets
+    settings dict and returns the list. Items of the list are target
+    names or dicts with `target` key and database settings to override.
+    `{target}` in string values of `[database]` is replaced
+    with the target name.
+    """
+    items = settings['database'].get('targets')
+
+    if not items:
+        return None
+
+    if isinstance(items, str):
+        items = _get_provider(items)(settings)
+
+    targets = [_make_target(settings['database'], item) for item in items]
+
+    names = [t.name for t in targets]
+    if len(set(names)) != len(names):
+        raise SettingsError("Targets names are not unique.")
+
+    databases = {repr(sorted(t.database.items())) for t in targets}
+    if len(databases) != len(targets):
+        raise SettingsError("Targets use the same database, use {} in "
+                            "database settings".format(PLACEHOLDER))
+
+    return targets
+
+
+def target_settings(settings, target):
+    """ Settings dict with database of target.
+    """
+    return dict(settings, database=target.database)
+
+
+def _make_target(database, item):
+    if isinstance(item, dict):
+        overrides = dict(item)
+        name = str(overrides.pop('target'))
+    else:
+        name, overrides = str(item), {}
+
+    database = {
+        key: value.replace(PLACEHOLDER, name) if isinstance(value, str) else value
+        for key, value in database.items() if key != 'targets'}
+    database.update(overrides)
+
+    return Target(name, database)
+
+
+def _get_provider(path):
+    if ':' not in path:
+        raise SettingsError("Targets provider must be 'module:callable', "
+                            "got {!r}".format(path))
+
+    module_name, name = path.split(':', 1)
+    return getattr(importlib.import_module(module_name), name)
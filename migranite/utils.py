@@ -1,3 +1,4 @@
+import contextlib
 import os
 
 
@@ -16,3 +17,21 @@ def parse_path(path):
         return os.path.join(package_dir, name)
     else:
         return os.path.abspath(os.path.expanduser(path))
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    """ Open temporary file for writing and replace `path` by it on success.
+    """
+    tmp_path = '{}.tmp{}'.format(path, os.getpid())
+
+    try:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
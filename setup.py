@@ -7,14 +7,18 @@ setup(
     classifiers=[
         "License :: OSI Approved :: BSD License",
         "Operating System :: POSIX",
-        "Programming Language :: Python :: 3.3",
-        "Programming Language :: Python :: 3.4",
-        "Programming Language :: Python :: 3.5",
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
+        "Programming Language :: Python :: 3.10",
+        "Programming Language :: Python :: 3.11",
         "Topic :: Software Development",
     ],
     url='https://github.com/zzzsochi/migranite',
     keywords=['migrations', 'development'],
     packages=find_packages(),
+    python_requires='>=3.7',
     install_requires=['zini', 'python-dateutil', 'colorama'],
     extras_require={'mongo': ['pymongo']},
     entry_points={
@@ -0,0 +1,130 @@
+import pytest
+
+from migranite import db
+from migranite.api import Migranite
+from migranite.db.json import JSON
+from migranite.exceptions import MigraniteError, MigrationFailed, SettingsError
+
+
+class BrokenJSON(JSON):
+    def add(self, migration, result, extra=None):
+        raise IOError("disk is full")
+
+
+db.register('broken-json', BrokenJSON)
+
+
+def make_settings(tmpdir, backend='json', sources=None):
+    path = tmpdir.mkdir('migrations')
+
+    for n, body in enumerate(sources or ['pass', 'pass'], 1):
+        path.join('{:03}-m{}.py'.format(n, n)).write(
+            '""" Migration {} """\ndepends_on = []\n\n\ndef run():\n    {}\n'
+            ''.format(n, body))
+
+    return {
+        'migrations': {'path': str(path), 'cache': False},
+        'templates': {'path': str(tmpdir)},
+        'database': {'backend': backend, 'path': str(tmpdir.join('db.json')),
+                     'lock': False},
+    }
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_database_error(tmpdir, jobs):
+    m = Migranite(make_settings(tmpdir, backend='broken-json'))
+    result = m.run(jobs=jobs, raise_errors=False)
+
+    assert not result.ok
+    runs = result.reports[0].runs
+    assert runs and all(r.result is False for r in runs)
+    assert all(isinstance(r.error, IOError) for r in runs)
+
+    with pytest.raises(MigrationFailed, match='disk is full'):
+        m.run(jobs=jobs)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_run(tmpdir, jobs):
+    m = Migranite(make_settings(tmpdir))
+    result = m.run(jobs=jobs)
+
+    assert result.ok
+    assert [r.result for r in result.reports[0].runs] == [True, True]
+    assert not m.plan().needed
+
+
+def test_force_without_names(tmpdir):
+    m = Migranite(make_settings(tmpdir))
+    m.run()
+
+    assert not m.plan(force=True).needed
+    assert [r.result for r in m.run(force=True).reports[0].runs] == []
+    assert m.plan(['m1'], force=True).forced == m.migrations.find(1, 'm1')
+
+
+def test_cprofile_async(tmpdir):
+    settings = make_settings(tmpdir)
+    tmpdir.join('migrations', '003-m3.py').write(
+        '""" Async """\n\n\nasync def run():\n    pass\n')
+    settings['migrations']['profiles'] = str(tmpdir.join('profiles'))
+    m = Migranite(settings)
+
+    with pytest.raises(MigraniteError, match='003-m3.py'):
+        m.run(profile='cprofile')
+
+    assert m.plan().pending == m.migrations.migrations
+
+    assert m.run(profile='tracemalloc').ok
+
+
+class LostLock:
+    lost = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class LostLockJSON(JSON):
+    def lock(self, timeout=None):
+        return LostLock()
+
+
+db.register('lost-lock-json', LostLockJSON)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_lock_lost(tmpdir, jobs):
+    settings = make_settings(tmpdir, backend='lost-lock-json')
+    settings['database']['lock'] = True
+    m = Migranite(settings)
+
+    with pytest.raises(MigrationFailed, match='LockLost'):
+        m.run(jobs=jobs)
+
+    assert m.plan().pending == m.migrations.migrations
+
+
+def test_missing_migrations(tmpdir):
+    settings = make_settings(tmpdir)
+    settings['migrations']['path'] = str(tmpdir.join('nothing'))
+
+    with pytest.raises(SettingsError, match='nothing'):
+        Migranite(settings).plan()
+
+
+def test_nothing_printed(tmpdir, capsys):
+    settings = make_settings(tmpdir, sources=['pass', 'raise ValueError'])
+    settings['database'].update(lock=True, journal=True)
+
+    with open(settings['database']['path'], 'w') as f:
+        f.write('{"broken')
+
+    m = Migranite(settings)
+    m.run(jobs=2, raise_errors=False)
+    m.plan()
+
+    assert capsys.readouterr() == ('', '')
@@ -0,0 +1,30 @@
+from collections import namedtuple
+
+import pytest
+
+from migranite.db import get as get_db
+
+Migration = namedtuple('Migration', 'num name md5')
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def db(request, tmpdir):
+    return get_db({'database': {'backend': request.param,
+                                'path': str(tmpdir.join('db'))}})
+
+
+def test_checkpoint(db):
+    migration = Migration(1, 'a', 'x' * 32)
+    db.set_checkpoint(migration, {'last': 10})
+
+    assert db.get_checkpoint(migration) == {'last': 10}
+
+    db.clear_checkpoint(migration)
+    assert db.get_checkpoint(migration) is None
+
+
+def test_changed_migration(db):
+    db.set_checkpoint(Migration(1, 'a', 'x' * 32), 10)
+
+    assert db.get_checkpoint(Migration(1, 'a', 'y' * 32)) is None
+    assert db.get_checkpoint(Migration(1, 'a', 'x' * 32)) is None
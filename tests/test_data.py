@@ -0,0 +1,33 @@
+import pytest
+
+from migranite.migrations.data import MigrationData, _write_records
+
+pymongo = pytest.importorskip('pymongo')
+
+
+class Collection:
+    """ Applies bulk_write requests to dict of documents.
+    """
+    def __init__(self):
+        self.docs = {}
+
+    def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            if isinstance(request, pymongo.ReplaceOne):
+                self.docs[request._doc['_id']] = request._doc
+            else:
+                self.docs[object()] = request._doc
+
+
+def test_write_again():
+    collection = Collection()
+    _write_records(collection, [{'_id': 1, 'a': 1}])
+    _write_records(collection, [{'_id': 1, 'a': 2}, {'_id': 2, 'a': 3}, {'b': 4}])
+
+    assert collection.docs[1] == {'_id': 1, 'a': 2}
+    assert len(collection.docs) == 3
+
+
+def test_abstract():
+    with pytest.raises(TypeError):
+        MigrationData({}, '001-data.jsonl')
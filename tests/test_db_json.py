@@ -0,0 +1,88 @@
+import json
+from collections import namedtuple
+
+import pytest
+
+from migranite.db.json import JSON
+
+Migration = namedtuple('Migration', 'num name short long source md5')
+
+MIGRATIONS = [
+    Migration(n, 'm{}'.format(n), 'Short {}'.format(n), 'Long {}'.format(n),
+              '"""Short {}"""\ndef run(): pass\n'.format(n), '{:032x}'.format(n))
+    for n in range(1, 4)
+]
+
+
+def make_db(tmpdir, journal, sources):
+    database = {'path': str(tmpdir.join('db.json')), 'journal': journal}
+    if sources:
+        database['sources'] = str(tmpdir.join('sources'))
+    return JSON({'database': database})
+
+
+def check_results(db):
+    assert [(r.num, r.name) for r in db.results] == [(m.num, m.name) for m in MIGRATIONS]
+
+    for r, m in zip(db.results, MIGRATIONS):
+        assert r.source == m.source
+        assert r.long == m.long
+        assert r.md5 == m.md5
+
+
+@pytest.mark.parametrize('journal', [False, True])
+@pytest.mark.parametrize('sources', [False, True])
+def test_roundtrip(tmpdir, journal, sources):
+    db = make_db(tmpdir, journal, sources)
+    for m in MIGRATIONS:
+        db.add(m, True)
+
+    check_results(db)
+    check_results(make_db(tmpdir, journal, sources))
+
+    if sources:
+        assert sorted(p.basename for p in tmpdir.join('sources').listdir()) == \
+            sorted(m.md5 for m in MIGRATIONS)
+
+
+@pytest.mark.parametrize('journal', [False, True])
+def test_compact_to_sources(tmpdir, journal):
+    """ Inline sources of old results are moved to the sources directory.
+    """
+    db = make_db(tmpdir, journal, sources=False)
+    for m in MIGRATIONS:
+        db.add(m, True)
+
+    db = make_db(tmpdir, journal, sources=True)
+    db.compact()
+
+    if journal:
+        with open(db.path) as f:
+            assert all('source' not in json.loads(line) for line in f)
+
+    check_results(db)
+    check_results(make_db(tmpdir, journal, sources=True))
+
+
+def test_compact_from_array(tmpdir):
+    db = make_db(tmpdir, journal=False, sources=False)
+    for m in MIGRATIONS:
+        db.add(m, True)
+
+    db = make_db(tmpdir, journal=True, sources=False)
+    db.compact()
+
+    check_results(db)
+    check_results(make_db(tmpdir, journal=True, sources=False))
+
+
+def test_journal_to_array(tmpdir):
+    db = make_db(tmpdir, journal=True, sources=False)
+    for m in MIGRATIONS:
+        db.add(m, True)
+
+    db = make_db(tmpdir, journal=False, sources=False)
+    db.add(MIGRATIONS[0], False)
+
+    assert db.results[0].source == MIGRATIONS[0].source
+    assert len(make_db(tmpdir, journal=False, sources=False).results) == 4
@@ -0,0 +1,64 @@
+from collections import namedtuple
+
+import pytest
+
+from migranite.db import get as get_db
+from migranite.db.base import MigrationResult
+from migranite.db.sources import pack
+
+Migration = namedtuple('Migration', 'num name short long source md5')
+
+MIGRATIONS = [
+    Migration(n, 'm{}'.format(n), 'Short', 'Long {}'.format(n),
+              'source {}'.format(n), '{:032x}'.format(n))
+    for n in range(1, 4)
+]
+
+
+def check(db):
+    results = db.full_results()
+
+    assert all(isinstance(r, MigrationResult) for r in results)
+    assert [(r.long, r.source) for r in results] == \
+        [(m.long, m.source) for m in MIGRATIONS]
+
+
+@pytest.mark.parametrize('database', [
+    {'backend': 'json'},
+    {'backend': 'json', 'journal': True},
+    {'backend': 'json', 'journal': True, 'sources': 'sources'},
+    {'backend': 'sqlite'},
+    {'backend': 'sqlite', 'sources': True},
+])
+def test_full_results(tmpdir, database):
+    database = dict(database, path=str(tmpdir.join('db')))
+    if database.get('sources') == 'sources':
+        database['sources'] = str(tmpdir.join('sources'))
+
+    db = get_db({'database': database})
+    for m in MIGRATIONS:
+        db.add(m, True)
+
+    check(db)
+    check(get_db({'database': database}))
+
+
+def test_full_results_mongo(monkeypatch):
+    mongomock = pytest.importorskip('mongomock')
+    from migranite.db import mongo
+
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(mongo.pymongo, 'MongoClient', lambda *a, **kw: client)
+    monkeypatch.setattr(mongo, '_clients', {})
+
+    db = get_db({'database': {'backend': 'mongo', 'name': 'test',
+                              'sources': 'sources'}})
+
+    # sources are written by bulk_write, which mongomock does not support
+    for m in MIGRATIONS:
+        client.test.sources.insert_one({'_id': m.md5, 'data': pack(m.source, m.long)})
+        client.test.migrations.insert_one({
+            'ts': m.num, 'num': m.num, 'name': m.name, 'short': m.short,
+            'md5': m.md5, 'result': True})
+
+    check(db)
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from migranite.graph import run_graph
+
+
+def test_order():
+    done = []
+    lock = threading.Lock()
+
+    def func(i):
+        time.sleep(0.01 if i == 0 else 0)
+        with lock:
+            done.append(i)
+        return True
+
+    results, errors = run_graph([0, 1, 2, 3], [set(), set(), {0, 1}, {2}], func, 4)
+
+    assert results == [True] * 4
+    assert errors == [None] * 4
+    assert done.index(2) > done.index(0)
+    assert done[-1] == 3
+
+
+def test_failed_dependency():
+    skipped = []
+
+    def func(i):
+        if i == 1:
+            raise ValueError(i)
+        return i != 0
+
+    results, errors = run_graph(list(range(5)), [set(), set(), {0}, {2}, {1}],
+                                func, 2, on_skip=skipped.append)
+
+    assert results == [False, False, None, None, None]
+    assert isinstance(errors[1], ValueError)
+    assert sorted(skipped) == [2, 3, 4]
+
+
+def test_many_items():
+    n = 5000
+    dependencies = [set()] + [{i - 1} for i in range(1, n)]
+
+    start = time.monotonic()
+    results, _ = run_graph(list(range(n)), dependencies, lambda i: True, 4)
+
+    assert all(results)
+    assert time.monotonic() - start < 10
@@ -0,0 +1,27 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from migranite.helpers.mongo import range_query, split_id_ranges  # noqa: E402
+
+
+@pytest.mark.parametrize('query', [None, {'x': 1}])
+def test_split_id_ranges(query):
+    collection = mongomock.MongoClient().db.c
+    collection.insert_many([{'_id': i, 'x': i % 2} for i in range(10000)])
+    total = collection.count_documents(query or {})
+
+    ranges = split_id_ranges(collection, 4, query)
+    counts = [collection.count_documents(range_query(query, *r)) for r in ranges]
+
+    assert len(ranges) == 4
+    assert ranges[0][0] is None and ranges[-1][1] is None
+    assert sum(counts) == total
+    assert all(c > total / 8 for c in counts)
+
+
+def test_split_id_ranges_empty():
+    collection = mongomock.MongoClient().db.c
+
+    assert split_id_ranges(collection, 4) == [(None, None)]
+    assert split_id_ranges(collection, 1) == [(None, None)]
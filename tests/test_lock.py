@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from migranite.db.mongo import Lease  # noqa: E402
+
+
+def test_lease_lost():
+    collection = mongomock.MongoClient().db.lock
+    lease = Lease(collection, ttl=0.3)
+
+    with lease:
+        assert not lease.lost
+        collection.update_one({'_id': 'run'}, {'$set': {'owner': 'other'}})
+        time.sleep(0.5)
+        assert lease.lost
+
+
+def test_lease_prolonged():
+    collection = mongomock.MongoClient().db.lock
+    lease = Lease(collection, ttl=0.3)
+
+    with lease:
+        time.sleep(0.5)
+        assert not lease.lost
+        assert not Lease(collection, ttl=0.3)._try_acquire()
@@ -0,0 +1,20 @@
+import sys
+
+import pytest
+
+from migranite.metrics import Measure, reset_peak_rss
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux') or not reset_peak_rss(),
+                    reason="peak RSS is reset on Linux only")
+def test_memory_per_block():
+    with Measure() as heavy:
+        data = bytearray(64 * 2 ** 20)
+        data[::4096] = b'x' * len(data[::4096])
+        del data
+
+    with Measure() as light:
+        pass
+
+    assert heavy.memory >= 32 * 2 ** 20
+    assert light.memory < 8 * 2 ** 20
@@ -0,0 +1,62 @@
+import pytest
+
+from migranite import run
+from migranite.api import Migranite
+from migranite.db import get as get_db
+from migranite.exceptions import LockTimeout
+from migranite.lock import FileLock
+
+from .test_api import make_settings
+
+
+def test_verify_fixed_failed(tmpdir, capsys):
+    settings = make_settings(tmpdir, sources=['pass', 'raise ValueError'])
+    Migranite(settings).run(raise_errors=False)
+
+    tmpdir.join('migrations', '002-m2.py').write('""" Fixed """\n\n\ndef run():\n    pass\n')
+    run.verify(settings)
+
+    out = capsys.readouterr().out
+    assert '2-m2: failed' in out
+    assert '0 changed, 1 failed' in out
+
+
+def test_verify_changed(tmpdir):
+    settings = make_settings(tmpdir)
+    Migranite(settings).run()
+
+    tmpdir.join('migrations', '002-m2.py').write('""" Changed """\n\n\ndef run():\n    pass\n')
+
+    with pytest.raises(SystemExit):
+        run.verify(settings)
+
+
+def test_verify_targets(tmpdir, capsys):
+    settings = make_settings(tmpdir)
+    settings['database']['path'] = str(tmpdir.join('db_{target}.json'))
+    settings['database']['targets'] = ['a', 'b']
+    Migranite(settings).run()
+
+    run.verify(settings)
+    assert '2 checked in 2 targets, 0 changed' in capsys.readouterr().out
+
+    tmpdir.join('migrations', '002-m2.py').write('""" Changed """\n\n\ndef run():\n    pass\n')
+
+    with pytest.raises(SystemExit):
+        run.verify(settings)
+
+    assert 'b/2-m2: changed' in capsys.readouterr().out
+    assert not tmpdir.join('db_{target}.json').exists()
+
+
+def test_compact_locked(tmpdir):
+    settings = make_settings(tmpdir)
+    settings['database'].update(lock=True, lock_timeout=0.1, journal=True)
+    Migranite(settings).run()
+
+    with FileLock(settings['database']['path'] + '.lock'):
+        with pytest.raises(LockTimeout):
+            run.compact(settings)
+
+    run.compact(settings)
+    assert len(get_db(settings).results) == 2